@@ -1,46 +1,221 @@
 #!/usr/bin/env python3
-"""Extract all images from Reid.pdf and save them to html/images/."""
+"""Extract all images from Reid.pdf and save them to html/images/.
 
+Images keep the fig_page{N}_img{k}.png names the pages refer to. Each
+distinct image is still decoded only once: further occurrences of the same
+xref or the same content are copied from the first file. images.json maps
+every page to the files of its images in page order.
+
+With --hashed-names each distinct image is written once, as
+img_<hash>.<ext>, and the fig_page{N}_img{k}.png references in html/*.html
+are pointed at those files in the same run.
+
+The main process reads raw image streams; colour conversion and PNG
+encoding run in a pool of worker processes fed through a bounded queue.
+
+With --preserve-format, images a browser can show as they are (JPEG, PNG,
+GIF) are written byte for byte; only the rest is converted, to PNG or
+WebP. The file names then no longer match the pages' references, so it
+rewrites html/*.html as --hashed-names does.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import argparse
+import hashlib
+import json
 import os
+import re
+import shutil
 import fitz  # PyMuPDF
 
-PDF_PATH = "/Users/shishengli/pairings-for-beginners/ag/Reid.pdf"
-OUT_DIR = "/Users/shishengli/pairings-for-beginners/ag/html/images"
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+PDF_PATH = os.path.join(HERE, "Reid.pdf")
+OUT_DIR = os.path.join(HERE, "html", "images")
+INDEX_PATH = os.path.join(OUT_DIR, "images.json")
+HTML_DIR = os.path.dirname(OUT_DIR)
 
-os.makedirs(OUT_DIR, exist_ok=True)
+# Embedded formats every browser displays, with the extension to save them under
+WEB_FORMATS = {"jpeg": "jpg", "png": "png", "gif": "gif"}
 
-doc = fitz.open(PDF_PATH)
-total_images = 0
+LEGACY_REF = re.compile(r'images/fig_page(\d+)_img(\d+)\.png')
 
-for page_num in range(len(doc)):
-    page = doc[page_num]
-    images = page.get_images(full=True)
-    if images:
-        print(f"Page {page_num + 1}: {len(images)} image(s)")
-    for img_idx, img_info in enumerate(images):
-        xref = img_info[0]
-        base_image = doc.extract_image(xref)
-        image_bytes = base_image["image"]
-        ext = base_image["ext"]  # original format (png, jpeg, etc.)
 
-        # Always save as .png for consistency
-        filename = f"fig_page{page_num + 1}_img{img_idx + 1}.png"
-        out_path = os.path.join(OUT_DIR, filename)
+def transcode(image_bytes, out_path, fmt="png", quality=80):
+    """Convert an embedded image to PNG or WebP at out_path."""
+    # Convert using fitz Pixmap
+    pix = fitz.Pixmap(image_bytes)
+    # If CMYK, convert to RGB first
+    if pix.n - pix.alpha > 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    if fmt == "webp":
+        pix.pil_save(out_path, format="WEBP", quality=quality)
+    else:
+        pix.save(out_path)
+
+
+class Transcoder:
+    """Run transcode in worker processes, with at most max_pending jobs in flight.
+
+    With jobs <= 1 everything runs inline in the calling process.
+    """
+
+    def __init__(self, jobs):
+        self.pool = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+        self.max_pending = 2 * jobs
+        self.pending = set()
+
+    def submit(self, image_bytes, out_path, fmt="png", quality=80):
+        if self.pool is None:
+            transcode(image_bytes, out_path, fmt, quality)
+            return
+        # Block the reader until a worker frees a slot, so memory stays flat
+        while len(self.pending) >= self.max_pending:
+            self._reap(FIRST_COMPLETED)
+        self.pending.add(self.pool.submit(transcode, image_bytes, out_path, fmt, quality))
+
+    def close(self):
+        if self.pool is not None:
+            self._reap()
+            self.pool.shutdown()
+
+    def _reap(self, return_when="ALL_COMPLETED"):
+        done, self.pending = wait(self.pending, return_when=return_when)
+        for future in done:
+            future.result()  # re-raise worker errors
+
+
+def save_image(doc, xref, stem, transcoder, preserve=False, fallback="png", quality=80):
+    """Write image xref as stem.<ext> in OUT_DIR and return the file name.
+
+    Conversions are handed to the transcoder. Files that already exist are
+    not written again.
+    """
+    if not preserve:
+        filename = stem + ".png"
+        if os.path.exists(os.path.join(OUT_DIR, filename)):
+            return filename
+
+    base_image = doc.extract_image(xref)
+    image_bytes = base_image["image"]
+    ext = base_image["ext"]  # original format (png, jpeg, etc.)
 
-        # If already png, write directly; otherwise convert via pixmap
-        if ext == "png":
+    # Embedded PNGs, and in preserve mode every web format except CMYK
+    # JPEGs, are copied as they are; everything else is converted
+    if ext == "png" or (preserve and ext in WEB_FORMATS and base_image.get("colorspace") != 4):
+        filename = f"{stem}.{WEB_FORMATS[ext]}"
+        out_path = os.path.join(OUT_DIR, filename)
+        if not os.path.exists(out_path):
             with open(out_path, "wb") as f:
                 f.write(image_bytes)
-        else:
-            # Convert to PNG using fitz Pixmap
-            pix = fitz.Pixmap(image_bytes)
-            # If CMYK, convert to RGB first
-            if pix.n - pix.alpha > 3:
-                pix = fitz.Pixmap(fitz.csRGB, pix)
-            pix.save(out_path)
+    else:
+        fmt = fallback if preserve else "png"
+        filename = f"{stem}.{fmt}"
+        out_path = os.path.join(OUT_DIR, filename)
+        if not os.path.exists(out_path):
+            transcoder.submit(image_bytes, out_path, fmt, quality)
+    return filename
+
+
+def rewrite_html(pages):
+    """Point images/fig_page{N}_img{k}.png references in HTML_DIR at the extracted files."""
+    def replace(match):
+        files = pages.get(match.group(1), [])
+        k = int(match.group(2))
+        return f"images/{files[k - 1]}" if k <= len(files) else match.group(0)
+
+    changed = 0
+    for name in sorted(os.listdir(HTML_DIR)):
+        if not name.endswith(".html"):
+            continue
+        path = os.path.join(HTML_DIR, name)
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        new_html = LEGACY_REF.sub(replace, html)
+        if new_html != html:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(new_html)
+            changed += 1
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", "-j", type=int, default=0,
+                        help="number of transcoding processes (default: one per CPU)")
+    parser.add_argument("--preserve-format", action="store_true",
+                        help="keep JPEG/PNG/GIF streams as they are instead of re-encoding to PNG")
+    parser.add_argument("--fallback", choices=["png", "webp"], default="png",
+                        help="format for images a browser cannot show as embedded (with --preserve-format)")
+    parser.add_argument("--quality", type=int, default=80,
+                        help="WebP quality for --fallback webp")
+    parser.add_argument("--hashed-names", action="store_true",
+                        help="write each distinct image once as img_<hash>.<ext> and point the HTML pages at it")
+    args = parser.parse_args()
+
+    os.makedirs(OUT_DIR, exist_ok=True)
+    transcoder = Transcoder(args.jobs or os.cpu_count())
+
+    doc = fitz.open(PDF_PATH)
+    by_xref = {}   # xref -> file name
+    by_hash = {}   # sha256 of the raw stream -> file name
+    images = {}    # file name -> details of the unique image
+    pages = {}     # page number -> [file name per image index]
+    copies = []    # (source, destination) for repeated images under legacy names
+    total_images = 0
+
+    for page_num in range(len(doc)):
+        page = doc[page_num]
+        page_images = page.get_images(full=True)
+        if page_images:
+            print(f"Page {page_num + 1}: {len(page_images)} image(s)")
+        occurrences = []
+        for img_index, img_info in enumerate(page_images, start=1):
+            xref, width, height = img_info[0], img_info[2], img_info[3]
+            total_images += 1
+            legacy_stem = f"fig_page{page_num + 1}_img{img_index}"
+
+            # Same xref on several pages: nothing to read or decode
+            first = by_xref.get(xref)
+            if first is None:
+                # Same content under a different xref: hash the still-encoded
+                # stream, which is much cheaper than decoding it
+                digest = hashlib.sha256(doc.xref_stream_raw(xref)).hexdigest()
+                first = by_hash.get(digest)
+                if first is None:
+                    stem = f"img_{digest[:16]}" if args.hashed_names else legacy_stem
+                    first = save_image(doc, xref, stem, transcoder,
+                                       args.preserve_format, args.fallback, args.quality)
+                    by_hash[digest] = first
+                    images[first] = {"sha256": digest, "xref": xref, "width": width, "height": height}
+                by_xref[xref] = first
+
+            filename = first
+            if not args.hashed_names and not first.startswith(legacy_stem + "."):
+                filename = legacy_stem + os.path.splitext(first)[1]
+                copies.append((first, filename))
+            occurrences.append(filename)
+
+        if occurrences:
+            pages[str(page_num + 1)] = occurrences
+
+    doc.close()
+    transcoder.close()
+    for source, destination in copies:
+        if not os.path.exists(os.path.join(OUT_DIR, destination)):
+            shutil.copyfile(os.path.join(OUT_DIR, source), os.path.join(OUT_DIR, destination))
+
+    with open(INDEX_PATH, "w", encoding="utf-8") as f:
+        # Relative to the repository, so the index does not depend on where it is checked out
+        source = os.path.relpath(PDF_PATH, ROOT).replace(os.sep, "/")
+        json.dump({"source": source, "images": images, "pages": pages}, f, indent=2)
+
+    print(f"\nTotal: {total_images} image occurrence(s), {len(images)} unique image(s) extracted to {OUT_DIR}")
+    print(f"Index written to {INDEX_PATH}")
 
-        total_images += 1
+    if args.hashed_names or args.preserve_format:
+        print(f"Rewrote image references in {rewrite_html(pages)} HTML file(s) in {HTML_DIR}")
 
-doc.close()
 
-print(f"\nTotal: {total_images} image(s) extracted to {OUT_DIR}")
+if __name__ == "__main__":
+    main()
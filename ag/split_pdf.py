@@ -1,213 +1,645 @@
 #!/usr/bin/env python3
-"""Split Reid.pdf into individual section PDFs based on menu.txt TOC."""
+"""Split every book in the repo into section PDFs.
 
-from pypdf import PdfReader, PdfWriter
+The section table of each book is read from its PDF outline. Books without
+an outline fall back to a text TOC (ag/menu.txt), the chapter table in
+page.md, or the numbered section headings found in the page text.
+"""
+
+from pypdf import PdfReader
+from pypdf.generic import (ArrayObject, ByteStringObject, DictionaryObject, IndirectObject, NameObject,
+                           StreamObject, TextStringObject)
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import fnmatch
+import glob
+import hashlib
+import io
+import json
 import os
+import re
+import unicodedata
 
-PDF_PATH = "/Users/shishengli/pairings-for-beginners/ag/Reid.pdf"
-OUTPUT_DIR = "/Users/shishengli/pairings-for-beginners/ag/sections"
-
-PAGE_OFFSET = 2  # PDF_page_1based = printed_page - PAGE_OFFSET
-
-entries = []
-
-# Chapter 0
-entries.append((11, "ch00_woffle", "0 Woffle"))
-entries.append((11, "ch00_s01_what_its_about", "0.1 What it's about"))
-entries.append((12, "ch00_s02_specific_calculations_versus_general_theory", "0.2 Specific calculations vs general theory"))
-entries.append((12, "ch00_s03_rings_of_functions_and_categories_of_geometry", "0.3 Rings of functions and categories"))
-entries.append((13, "ch00_s04_geometry_from_polynomials", "0.4 Geometry from polynomials"))
-entries.append((14, "ch00_s05_purely_algebraically_defined", "0.5 Purely algebraically defined"))
-entries.append((14, "ch00_s06_plan_of_the_book", "0.6 Plan of the book"))
-entries.append((15, "ch00_course_prerequisites", "Course prerequisites"))
-entries.append((15, "ch00_course_relates_to", "Course relates to"))
-entries.append((15, "ch00_exercises", "Exercises to Chapter 0"))
-entries.append((16, "ch00_books", "Books"))
-
-# Part I
-entries.append((17, "part_I_playing_with_plane_curves", "Part I Playing with plane curves"))
-
-# Chapter 1
-entries.append((19, "ch01_plane_conics", "1 Plane conics"))
-entries.append((19, "ch01_s01_example_of_a_parametrised_curve", "1.1 Example of a parametrised curve"))
-entries.append((20, "ch01_s02_similar_example", "1.2 Similar example"))
-entries.append((21, "ch01_s03_conics_in_r2", "1.3 Conics in R2"))
-entries.append((21, "ch01_s04_projective_plane", "1.4 Projective plane"))
-entries.append((23, "ch01_s05_equation_of_a_conic", "1.5 Equation of a conic"))
-entries.append((23, "ch01_s05b_line_at_infinity_and_asymptotic_directions", "Line at infinity and asymptotic directions"))
-entries.append((24, "ch01_s06_classification_of_conics_in_p2", "1.6 Classification of conics in P2"))
-entries.append((25, "ch01_s07_parametrisation_of_a_conic", "1.7 Parametrisation of a conic"))
-entries.append((25, "ch01_s08_homogeneous_form_in_2_variables", "1.8 Homogeneous form in 2 variables"))
-entries.append((26, "ch01_s09_easy_cases_of_bezouts_theorem", "1.9 Easy cases of Bezout's Theorem"))
-entries.append((27, "ch01_s10_corollary_unique_conic_through_5_general_points", "1.10 Corollary"))
-entries.append((28, "ch01_s11_space_of_all_conics", "1.11 Space of all conics"))
-entries.append((29, "ch01_s12_intersection_of_two_conics", "1.12 Intersection of two conics"))
-entries.append((30, "ch01_s13_degenerate_conics_in_a_pencil", "1.13 Degenerate conics in a pencil"))
-entries.append((30, "ch01_s14_worked_example", "1.14 Worked example"))
-entries.append((32, "ch01_exercises", "Exercises to Chapter 1"))
-
-# Chapter 2
-entries.append((35, "ch02_cubics_and_the_group_law", "2 Cubics and the group law"))
-entries.append((35, "ch02_s01_examples_of_parametrised_cubics", "2.1 Examples of parametrised cubics"))
-entries.append((36, "ch02_s02_curve_has_no_rational_parametrisation", "2.2 No rational parametrisation"))
-entries.append((37, "ch02_s03_lemma", "2.3 Lemma"))
-entries.append((37, "ch02_s04_linear_systems", "2.4 Linear systems"))
-entries.append((38, "ch02_s05_lemma_divisibility_by_l_or_by_q", "2.5 Lemma: divisibility"))
-entries.append((39, "ch02_s06_proposition_cubics_through_8_general_points", "2.6 Proposition"))
-entries.append((40, "ch02_s07_corollary_cubic_through_8_points", "2.7 Corollary"))
-entries.append((40, "ch02_s08_group_law_on_a_plane_cubic", "2.8 Group law on a plane cubic"))
-entries.append((42, "ch02_s09_associativity_in_general", "2.9 Associativity in general"))
-entries.append((42, "ch02_s10_proof_by_continuity", "2.10 Proof by continuity"))
-entries.append((43, "ch02_s11_pascals_theorem", "2.11 Pascal's Theorem"))
-entries.append((44, "ch02_s12_inflexion_normal_form", "2.12 Inflexion, normal form"))
-entries.append((45, "ch02_s13_simplified_group_law", "2.13 Simplified group law"))
-entries.append((46, "ch02_exercises", "Exercises to Chapter 2"))
-entries.append((49, "ch02_s14_topology_of_a_nonsingular_cubic", "2.14 Topology of a nonsingular cubic"))
-entries.append((51, "ch02_s15_discussion_of_genus", "2.15 Discussion of genus"))
-entries.append((51, "ch02_s16_commercial_break", "2.16 Commercial break"))
-
-# Part II
-entries.append((55, "part_II_the_category_of_affine_varieties", "Part II The category of affine varieties"))
-
-# Chapter 3
-entries.append((57, "ch03_affine_varieties_and_the_nullstellensatz", "3 Affine varieties and the Nullstellensatz"))
-entries.append((57, "ch03_s01_definition_of_noetherian_ring", "3.1 Definition of Noetherian ring"))
-entries.append((58, "ch03_s02_proposition_noetherian_passes_to_quotients", "3.2 Proposition"))
-entries.append((58, "ch03_s03_hilbert_basis_theorem", "3.3 Hilbert Basis Theorem"))
-entries.append((59, "ch03_s04_the_correspondence_v", "3.4 The correspondence V"))
-entries.append((59, "ch03_s05_definition_the_zariski_topology", "3.5 The Zariski topology"))
-entries.append((60, "ch03_s06_the_correspondence_i", "3.6 The correspondence I"))
-entries.append((61, "ch03_s07_irreducible_algebraic_set", "3.7 Irreducible algebraic set"))
-entries.append((62, "ch03_s08_preparation_for_the_nullstellensatz", "3.8 Preparation for Nullstellensatz"))
-entries.append((62, "ch03_s09_definition_radical_ideal", "3.9 Radical ideal"))
-entries.append((64, "ch03_s11_worked_examples", "3.11 Worked examples"))
-entries.append((65, "ch03_s12_finite_algebras", "3.12 Finite algebras"))
-entries.append((66, "ch03_s13_noether_normalisation", "3.13 Noether normalisation"))
-entries.append((68, "ch03_s14_remarks", "3.14 Remarks"))
-entries.append((68, "ch03_s15_proof_of_3_8", "3.15 Proof of (3.8)"))
-entries.append((68, "ch03_s16_separable_addendum", "3.16 Separable addendum"))
-entries.append((69, "ch03_s17_reduction_to_a_hypersurface", "3.17 Reduction to a hypersurface"))
-entries.append((70, "ch03_exercises", "Exercises to Chapter 3"))
-
-# Chapter 4
-entries.append((73, "ch04_functions_on_varieties", "4 Functions on varieties"))
-entries.append((73, "ch04_s01_polynomial_functions", "4.1 Polynomial functions"))
-entries.append((73, "ch04_s02_kv_and_algebraic_subsets", "4.2 k[V] and algebraic subsets"))
-entries.append((74, "ch04_s03_polynomial_maps", "4.3 Polynomial maps"))
-entries.append((75, "ch04_s04_polynomial_maps_and_kv", "4.4 Polynomial maps and k[V]"))
-entries.append((76, "ch04_s05_corollary_f_isomorphism", "4.5 Corollary"))
-entries.append((77, "ch04_s06_affine_variety", "4.6 Affine variety"))
-entries.append((77, "ch04_s07_function_field", "4.7 Function field"))
-entries.append((78, "ch04_s08_criterion_for_dom_f", "4.8 Criterion for dom f"))
-entries.append((78, "ch04_s09_rational_maps", "4.9 Rational maps"))
-entries.append((79, "ch04_s10_composition_of_rational_maps", "4.10 Composition of rational maps"))
-entries.append((79, "ch04_s11_theorem_dominant_rational_maps", "4.11 Theorem"))
-entries.append((79, "ch04_s12_morphisms_from_open_subset", "4.12 Morphisms from open subset"))
-entries.append((80, "ch04_s13_standard_open_subsets", "4.13 Standard open subsets"))
-entries.append((81, "ch04_s14_worked_example", "4.14 Worked example"))
-entries.append((82, "ch04_exercises", "Exercises to Chapter 4"))
-
-# Part III
-entries.append((85, "part_III_applications", "Part III Applications"))
-
-# Chapter 5
-entries.append((87, "ch05_projective_and_birational_geometry", "5 Projective and birational geometry"))
-entries.append((87, "ch05_s00_why_projective_varieties", "5.0 Why projective varieties?"))
-entries.append((88, "ch05_s01_graded_rings_and_homogeneous_ideals", "5.1 Graded rings"))
-entries.append((89, "ch05_s02_the_homogeneous_vi_correspondences", "5.2 Homogeneous V-I correspondences"))
-entries.append((89, "ch05_s03_projective_nullstellensatz", "5.3 Projective Nullstellensatz"))
-entries.append((90, "ch05_s04_rational_functions_on_v", "5.4 Rational functions on V"))
-entries.append((91, "ch05_s05_affine_covering", "5.5 Affine covering"))
-entries.append((92, "ch05_s06_rational_maps_and_morphisms", "5.6 Rational maps and morphisms"))
-entries.append((93, "ch05_s07_examples", "5.7 Examples"))
-entries.append((94, "ch05_s08_birational_maps", "5.8 Birational maps"))
-entries.append((95, "ch05_s09_rational_varieties", "5.9 Rational varieties"))
-entries.append((95, "ch05_s10_reduction_to_a_hypersurface", "5.10 Reduction to a hypersurface"))
-entries.append((95, "ch05_s11_products", "5.11 Products"))
-entries.append((96, "ch05_exercises", "Exercises to Chapter 5"))
-
-# Chapter 6
-entries.append((101, "ch06_tangent_space_and_nonsingularity_dimension", "6 Tangent space and nonsingularity"))
-entries.append((101, "ch06_s01_nonsingular_points_of_a_hypersurface", "6.1 Nonsingular points"))
-entries.append((102, "ch06_s02_remarks", "6.2 Remarks"))
-entries.append((102, "ch06_s03_proposition_v_nonsing_is_dense", "6.3 V nonsing is dense"))
-entries.append((103, "ch06_s04_tangent_space", "6.4 Tangent space"))
-entries.append((103, "ch06_s05_proposition_dim_tp_v_upper_semicontinuous", "6.5 dim TP V upper semicontinuous"))
-entries.append((103, "ch06_s06_corollary_definition_dim_tp_v", "6.6 Corollary-Definition"))
-entries.append((104, "ch06_s07_dim_v_tr_deg_hypersurface_case", "6.7 dim V = tr deg"))
-entries.append((104, "ch06_s08_intrinsic_nature_of_tp_v", "6.8 Intrinsic nature of TP V"))
-entries.append((105, "ch06_s09_corollary_tp_v_depends_on_p", "6.9 Corollary"))
-entries.append((106, "ch06_s10_theorem_dim_v_tr_deg", "6.10 Theorem"))
-entries.append((106, "ch06_s11_nonsingularity_and_projective_varieties", "6.11 Nonsingularity and projective"))
-entries.append((106, "ch06_s12_worked_example_blowup", "6.12 Worked example: blowup"))
-entries.append((107, "ch06_exercises", "Exercises to Chapter 6"))
-
-# Chapter 7
-entries.append((109, "ch07_the_27_lines_on_a_cubic_surface", "7 The 27 lines"))
-entries.append((109, "ch07_s01_consequences_of_nonsingularity", "7.1 Consequences of nonsingularity"))
-entries.append((110, "ch07_s02_proposition_existence_of_a_line", "7.2 Existence of a line"))
-entries.append((112, "ch07_s03_proposition_lines_meeting_a_given_line", "7.3 Lines meeting a given line"))
-entries.append((114, "ch07_s04_corollary_two_disjoint_lines", "7.4 Two disjoint lines"))
-entries.append((114, "ch07_s05_finding_all_the_lines", "7.5 Finding all the lines"))
-entries.append((115, "ch07_s06_the_27_lines", "7.6 The 27 lines"))
-entries.append((116, "ch07_s07_the_configuration_of_lines", "7.7 Configuration of lines"))
-entries.append((117, "ch07_exercises", "Exercises to Chapter 7"))
-
-# Chapter 8
-entries.append((121, "ch08_final_comments", "8 Final comments"))
-entries.append((121, "ch08_s01_introduction", "8.1 Introduction"))
-entries.append((121, "ch08_s02_prehistory", "8.2 Prehistory"))
-entries.append((122, "ch08_s03_rigour_the_first_wave", "8.3 Rigour, the first wave"))
-entries.append((122, "ch08_s04_the_grothendieck_era", "8.4 The Grothendieck era"))
-entries.append((123, "ch08_s05_the_big_bang", "8.5 The big bang"))
-entries.append((124, "ch08_s06_choice_of_topics", "8.6 Choice of topics"))
-entries.append((124, "ch08_s07_computation_versus_theory", "8.7 Computation versus theory"))
-entries.append((124, "ch08_s08_r_versus_c", "8.8 R versus C"))
-entries.append((125, "ch08_s09_regular_functions_and_sheaves", "8.9 Regular functions and sheaves"))
-entries.append((125, "ch08_s10_globally_defined_regular_functions", "8.10 Globally defined regular functions"))
-entries.append((125, "ch08_s11_surprising_sufficiency_of_projective_ag", "8.11 Surprising sufficiency"))
-entries.append((126, "ch08_s12_affine_varieties_and_schemes", "8.12 Affine varieties and schemes"))
-entries.append((127, "ch08_s13_whats_the_point", "8.13 What's the point?"))
-entries.append((129, "ch08_s14_how_schemes_are_more_general", "8.14 How schemes are more general"))
-entries.append((131, "ch08_s15_proof_existence_of_lines_on_cubic_surface", "8.15 Proof of existence of lines"))
-entries.append((132, "ch08_s16_acknowledgements_and_name_dropping", "8.16 Acknowledgements"))
-
-print(f"Total TOC entries: {len(entries)}")
-
-# Load PDF
-reader = PdfReader(PDF_PATH)
-total_pdf_pages = len(reader.pages)
-print(f"Total PDF pages: {total_pdf_pages}")
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-for i, (printed_page, filename, description) in enumerate(entries):
-    # Start PDF page (0-indexed)
-    start_pdf_0 = printed_page - PAGE_OFFSET - 1
-
-    # End PDF page: include up to next section's start page (inclusive)
-    if i + 1 < len(entries):
-        next_printed_page = entries[i + 1][0]
-        end_pdf_0 = next_printed_page - PAGE_OFFSET - 1  # next section's start page (0-indexed)
-    else:
-        end_pdf_0 = total_pdf_pages - 1
+# The repository root, one level above this script
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Books split in one run; paths are relative to ROOT. "{stem}" in
+# output_dir is the PDF file name without extension. "toc" is the
+# fallback used when the PDF has no outline.
+BOOKS = [
+    {"pdf": "ag/Reid.pdf", "output_dir": "ag/sections", "toc": "ag/menu.txt"},
+    {"pdf": "paper.pdf", "output_dir": "paper_sections", "toc": "page.md"},
+    {"pdf": "ff/ff.pdf", "output_dir": "ff/sections"},
+    {"pdf": "cf/*.pdf", "output_dir": "cf/sections/{stem}"},
+]
+
+MANIFEST_NAME = "split_manifest.json"
+
+# Text TOC line: title, optional dot leaders, printed page number
+TOC_LINE = re.compile(r"^(.*?[^\s.])[\s.]*?\s(\d+)$")
+
+# Numbered heading at the start of a line, e.g. "5.1. Homotopy. Suppose ..."
+HEADING_LINE = re.compile(r"^(\d+\.\d+)\.\s+([A-Z][^.]{1,80})\.")
+
+# Printed page number at the start or end of a running head or foot
+PAGE_NUMBER = re.compile(r"^(\d+)\s|\s(\d+)$|^(\d+)$")
+
+# Section number ("1", "2.3", "2.1.4") or part number ("II") at the start of a title
+SECTION_NUMBER = re.compile(r"^(\d+(?:\.\d+)*)\.?\s+(.*)$")
+PART_NUMBER = re.compile(r"^([IVX]+)\s+(.*)$")
+
+
+def slugify(text, max_len=60):
+    """Lowercase ASCII file name fragment for a section title."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    slug = re.sub(r"[^a-z0-9]+", "_", text.lower().replace("'", "")).strip("_")
+    if len(slug) > max_len:
+        slug = slug[:max_len].rsplit("_", 1)[0]
+    return slug
+
+
+def section_names(descriptions):
+    """Return a file name for each section title that does not depend on its position.
+
+    Numbered sections are named after their number ("1.5 Equation of a conic"
+    is ch01_s05_equation_of_a_conic), parts after theirs (part_I_...), and
+    other titles after the chapter they are in (ch01_exercises_to_chapter_1),
+    so inserting a TOC line only adds a name. Repeated names get a suffix.
+    """
+    names = []
+    seen = Counter()
+    chapter = None
+    for description in descriptions:
+        numbered = SECTION_NUMBER.match(description)
+        part = PART_NUMBER.match(description)
+        if numbered:
+            numbers = [int(n) for n in numbered.group(1).split(".")]
+            chapter = numbers[0]
+            name = f"ch{chapter:02d}_" + "".join(f"s{n:02d}_" for n in numbers[1:]) + slugify(numbered.group(2))
+        elif part:
+            name = f"part_{part.group(1)}_{slugify(part.group(2))}"
+        elif chapter is not None:
+            name = f"ch{chapter:02d}_{slugify(description)}"
+        else:
+            name = slugify(description) or "section"
+        name = name.strip("_")
+        seen[name] += 1
+        names.append(name if seen[name] == 1 else f"{name}_{seen[name]}")
+    return names
+
+
+def outline_entries(reader):
+    """Return [(start_pdf_0, title)] from the PDF outline, in reading order."""
+    entries = []
+
+    def walk(items):
+        for item in items:
+            if isinstance(item, list):
+                walk(item)
+                continue
+            page = reader.get_destination_page_number(item)
+            if page is not None and page >= 0:
+                entries.append((page, item.title.strip()))
+
+    walk(reader.outline)
+    return entries
+
+
+def detect_page_offset(reader, samples=20):
+    """Return printed_page - PDF_page_1based, voted from page numbers in running heads and feet."""
+    votes = Counter()
+    step = max(1, len(reader.pages) // samples)
+    for index in range(0, len(reader.pages), step):
+        lines = reader.pages[index].extract_text().strip().split("\n")
+        for line in {lines[0].strip(), lines[-1].strip()}:
+            match = PAGE_NUMBER.search(line)
+            if match:
+                printed = int(next(g for g in match.groups() if g))
+                votes[printed - (index + 1)] += 1
+    return votes.most_common(1)[0][0] if votes else 0
+
+
+def menu_entries(menu_path, reader):
+    """Return [(start_pdf_0, title)] from a text TOC whose lines end in printed page numbers."""
+    offset = detect_page_offset(reader)
+    entries = []
+    with open(menu_path, encoding="utf-8") as f:
+        for line in f:
+            line = unicodedata.normalize("NFKC", line.strip())
+            match = TOC_LINE.match(line)
+            if not match or not re.search(r"[A-Za-z]", match.group(1)):
+                continue
+            title = match.group(1).strip(" .")
+            if title.upper() == "CONTENTS":
+                continue
+            entries.append((int(match.group(2)) - offset - 1, title))
+    return entries
+
+
+def page_md_entries(page_md_path):
+    """Return [(start_pdf_0, title)] from the "| Chapter | Title | PDF Pages | ..." table."""
+    entries = []
+    with open(page_md_path, encoding="utf-8") as f:
+        for line in f:
+            cells = [c.strip() for c in line.strip().strip("|").split("|")]
+            if len(cells) < 3:
+                continue
+            pages = re.match(r"(\d+)-(\d+)$", cells[2])
+            if pages:
+                title = cells[1] if cells[0] == "-" else f"{cells[0]} {cells[1]}"
+                entries.append((int(pages.group(1)) - 1, title))
+    return entries
+
+
+def heading_entries(reader, stem):
+    """Return [(start_pdf_0, title)] from numbered headings in the page text."""
+    entries = []
+    for index, page in enumerate(reader.pages):
+        for line in (page.extract_text() or "").split("\n"):
+            match = HEADING_LINE.match(line.strip())
+            if match:
+                entries.append((index, f"{match.group(1)} {match.group(2).strip()}"))
+    if not entries or entries[0][0] > 0:
+        entries.insert(0, (0, stem))
+    return entries
+
+
+def section_table(reader, toc_path, stem):
+    """Build the section table of a book and name the source it came from."""
+    entries = outline_entries(reader)
+    if entries:
+        return entries, "outline"
+    if toc_path and toc_path.endswith(".md"):
+        return page_md_entries(toc_path), os.path.basename(toc_path)
+    if toc_path:
+        return menu_entries(toc_path, reader), os.path.basename(toc_path)
+    return heading_entries(reader, stem), "headings"
+
+
+def section_ranges(entries, total_pdf_pages):
+    """Return (index, filename, description, start_pdf_0, end_pdf_0) for every entry.
+
+    A section runs up to the page where the next one starts (inclusive).
+    An entry whose range is empty has start_pdf_0 > end_pdf_0 and is skipped
+    by split_sections.
+    """
+    sections = []
+    names = section_names([description for _, description in entries])
+    for i, (start_pdf_0, description) in enumerate(entries):
+        if i + 1 < len(entries):
+            end_pdf_0 = entries[i + 1][0]
+        else:
+            end_pdf_0 = total_pdf_pages - 1
+
+        start_pdf_0 = max(0, start_pdf_0)
+        end_pdf_0 = min(total_pdf_pages - 1, end_pdf_0)
+        sections.append((i, names[i], description, start_pdf_0, end_pdf_0))
+    return sections
+
+
+# Key standing in for the /Pages node of whichever section is being written
+PAGES = "pages"
+
+# Article beads point into pages that are not part of the section; the
+# annotations are written separately, without links to pages outside it
+SKIP_PAGE_KEYS = ("/Parent", "/Annots", "/B")
+
+# Marks a link annotation in a page template: ("link", target page index, object key)
+LINK = "link"
+
+
+class SharedObjectCache:
+    """Serialize every object of the source PDF once and reuse it for all sections.
+
+    A serialized object is a list of byte chunks interleaved with the keys of
+    the objects it references; writing a section only renumbers those keys.
+    Stream data is copied still encoded, so fonts and images are never
+    decompressed or recompressed.
+
+    Annotations are kept. Internal links that go to a named destination are
+    given the explicit destination instead, since a section has no name
+    tree; a link to a page outside the section is left out of it.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.templates = {}
+        self.page_keys = {}
+        self._named = None
+        for index, page in enumerate(reader.pages):
+            ref = page.indirect_reference
+            self.page_keys[(ref.idnum, ref.generation)] = ("page", index)
+
+    def template(self, key):
+        """Return the serialized parts of a page ("page", index) or source object (idnum, gen)."""
+        if key not in self.templates:
+            parts = []
+            if key[0] == "page":
+                page = self.reader.pages[key[1]]
+                body = DictionaryObject({k: v for k, v in page.items() if k not in SKIP_PAGE_KEYS})
+                self._serialize(body, parts)
+                parts[-1:] = [parts[-1][:-2], b"/Parent ", PAGES, b" "]
+                if "/Annots" in page:
+                    self._serialize_annots(page["/Annots"].get_object(), parts)
+                self._append(parts, b">>")
+            else:
+                obj = self.reader.get_object(IndirectObject(key[0], key[1], self.reader))
+                target = self.link_target(obj)
+                if target is not None and target[1] is not None:
+                    # Named destination: point the link at the page itself
+                    obj = DictionaryObject({k: v for k, v in obj.items() if k not in ("/Dest", "/A")})
+                    obj[NameObject("/Dest")] = target[1]
+                self._serialize(obj, parts)
+            self.templates[key] = parts
+        return self.templates[key]
+
+    def link_target(self, annot):
+        """For a link to a page of this PDF: (page index or None if unknown, explicit
+        destination replacing a named one or None). None for other annotations."""
+        if not isinstance(annot, DictionaryObject) or annot.get("/Subtype") != "/Link":
+            return None
+        dest = annot.get("/Dest")
+        if dest is None:
+            action = annot.get("/A")
+            action = action.get_object() if action is not None else None
+            if not isinstance(action, DictionaryObject) or action.get("/S") != "/GoTo":
+                return None
+            dest = action.get("/D")
+        dest = dest.get_object() if isinstance(dest, IndirectObject) else dest
+
+        explicit = None
+        if isinstance(dest, (NameObject, TextStringObject, ByteStringObject)):
+            if self._named is None:
+                self._named = self.reader.named_destinations
+            named = self._named.get(str(dest))
+            if named is None and isinstance(dest, NameObject):
+                named = self._named.get(str(dest)[1:])
+            if named is None:
+                return None, None
+            dest = explicit = named.dest_array
+        if isinstance(dest, DictionaryObject):
+            dest = dest.get("/D")
+        if not isinstance(dest, ArrayObject) or not dest or not isinstance(dest[0], IndirectObject):
+            return None, explicit
+        page = self.page_keys.get((dest[0].idnum, dest[0].generation))
+        return (page[1] if page else None), explicit
+
+    def _serialize_annots(self, annots, parts):
+        self._append(parts, b"/Annots [")
+        for ref in annots:
+            target = self.link_target(ref.get_object()) if isinstance(ref, IndirectObject) else None
+            if target is None:
+                self._serialize(ref, parts)
+            elif target[0] is not None:
+                parts.append((LINK, target[0], (ref.idnum, ref.generation)))
+            self._append(parts, b" ")
+        self._append(parts, b"] ")
+
+    def _ref_key(self, ref):
+        key = (ref.idnum, ref.generation)
+        if key in self.page_keys:
+            return self.page_keys[key]
+        obj = ref.get_object()
+        if isinstance(obj, DictionaryObject) and obj.get("/Type") == "/Pages":
+            return PAGES
+        return key
+
+    def _serialize(self, obj, parts):
+        if isinstance(obj, IndirectObject):
+            parts.append(self._ref_key(obj))
+        elif isinstance(obj, DictionaryObject):
+            self._append(parts, b"<< ")
+            for k, v in obj.items():
+                if isinstance(obj, StreamObject) and k == "/Length":
+                    continue
+                self._serialize(k, parts)
+                self._append(parts, b" ")
+                self._serialize(v, parts)
+                self._append(parts, b" ")
+            if isinstance(obj, StreamObject):
+                data = self._encoded_data(obj)
+                self._append(parts, b"/Length %d >>\nstream\n" % len(data) + data + b"\nendstream")
+            else:
+                self._append(parts, b">>")
+        elif isinstance(obj, ArrayObject):
+            self._append(parts, b"[")
+            for v in obj:
+                self._serialize(v, parts)
+                self._append(parts, b" ")
+            self._append(parts, b"]")
+        else:
+            buf = io.BytesIO()
+            obj.write_to_stream(buf)
+            self._append(parts, buf.getvalue())
 
-    start_pdf_0 = max(0, start_pdf_0)
-    end_pdf_0 = min(total_pdf_pages - 1, end_pdf_0)
+    @staticmethod
+    def _encoded_data(stream):
+        """The stream's data exactly as it is encoded in the source file"""
+        buf = io.BytesIO()
+        stream.write_to_stream(buf)
+        written = buf.getvalue()
+        # write_to_stream writes the dictionary, then "stream", the data and "endstream"
+        return written[written.index(b">>\nstream\n") + len(b">>\nstream\n"):-len(b"\nendstream")]
 
-    if start_pdf_0 > end_pdf_0:
-        print(f"  SKIP (invalid range): {filename}")
-        continue
+    @staticmethod
+    def _append(parts, data):
+        if parts and isinstance(parts[-1], bytes):
+            parts[-1] += data
+        else:
+            parts.append(data)
 
-    writer = PdfWriter()
-    for p in range(start_pdf_0, end_pdf_0 + 1):
-        writer.add_page(reader.pages[p])
 
-    out_path = os.path.join(OUTPUT_DIR, filename + ".pdf")
+def write_section(cache, start_pdf_0, end_pdf_0, out_path):
+    """Write pages start_pdf_0..end_pdf_0 to out_path and return the SHA-256 of the file."""
+    page_keys = [("page", p) for p in range(start_pdf_0, end_pdf_0 + 1)]
+
+    in_section = set(page_keys)
+
+    def reference(part):
+        """The object a template part refers to in this section, or None"""
+        if part[0] == LINK:
+            # A link annotation is only kept if the page it goes to is here
+            return part[2] if ("page", part[1]) in in_section else None
+        if part[0] == "page" and part not in in_section:
+            return None
+        return part
+
+    # Number objects breadth-first from the pages: 1 is the catalog, 2 the page tree
+    numbers = {PAGES: 2}
+    order = []
+    pending = deque(page_keys)
+    while pending:
+        key = pending.popleft()
+        if key in numbers:
+            continue
+        numbers[key] = len(order) + 3
+        order.append(key)
+        for part in cache.template(key):
+            if not isinstance(part, bytes) and part != PAGES:
+                ref = reference(part)
+                if ref is not None and ref not in numbers:
+                    pending.append(ref)
+
+    kids = b" ".join(b"%d 0 R" % numbers[k] for k in page_keys)
+    bodies = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Count %d /Kids [%s] >>" % (len(page_keys), kids),
+    ]
+    for key in order:
+        body = []
+        for part in cache.template(key):
+            if isinstance(part, bytes):
+                body.append(part)
+            elif part[0] == LINK:
+                ref = reference(part)
+                body.append(b"%d 0 R" % numbers[ref] if ref is not None else b"")
+            else:
+                body.append(b"%d 0 R" % numbers[part] if part in numbers else b"null")
+        bodies.append(b"".join(body))
+
+    out = [cache.reader.pdf_header.encode() + b"\n%\xe2\xe3\xcf\xd3\n"]
+    offsets = []
+    pos = len(out[0])
+    for number, body in enumerate(bodies, start=1):
+        obj = b"%d 0 obj\n%s\nendobj\n" % (number, body)
+        offsets.append(pos)
+        out.append(obj)
+        pos += len(obj)
+
+    out.append(b"xref\n0 %d\n0000000000 65535 f \n" % (len(bodies) + 1))
+    out.extend(b"%010d 00000 n \n" % offset for offset in offsets)
+    out.append(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(bodies) + 1, pos))
+
+    data = b"".join(out)
     with open(out_path, "wb") as f:
-        writer.write(f)
+        f.write(data)
+    return hashlib.sha256(data).hexdigest()
+
+
+def split_sections(cache, sections, output_dir, total_entries):
+    """Write each section with the given cache.
+
+    Returns the progress log lines in order and a dict of filename -> output SHA-256.
+    """
+    log = []
+    written = {}
+    for i, filename, description, start_pdf_0, end_pdf_0 in sections:
+        if start_pdf_0 > end_pdf_0:
+            log.append(f"  SKIP (invalid range): {filename}")
+            continue
+
+        out_path = os.path.join(output_dir, filename + ".pdf")
+        written[filename] = write_section(cache, start_pdf_0, end_pdf_0, out_path)
+
+        num_pages = end_pdf_0 - start_pdf_0 + 1
+        log.append(f"  [{i+1:3d}/{total_entries}] {filename}.pdf  (PDF p.{start_pdf_0+1}-{end_pdf_0+1}, {num_pages} pg) - {description}")
+    return log, written
+
+
+def file_digest(path, cached=None):
+    """Return the SHA-256 of a file, reusing cached["sha256"] if size and mtime are unchanged."""
+    st = os.stat(path)
+    cached = cached or {}
+    if cached.get("size") == st.st_size and cached.get("mtime_ns") == st.st_mtime_ns:
+        return cached["sha256"]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_record(path, digest):
+    st = os.stat(path)
+    return {"path": os.path.relpath(path, ROOT), "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+
+
+def without_stats(manifest):
+    """A manifest without the sizes and mtimes that only serve to skip re-hashing"""
+    def strip(record):
+        return {k: v for k, v in record.items() if k not in ("size", "mtime_ns")}
+    return dict(manifest, source=strip(manifest.get("source", {})), toc=strip(manifest.get("toc", {})),
+                sections={name: strip(r) for name, r in manifest.get("sections", {}).items()})
+
+
+def output_current(path, record):
+    """Whether a section file still has the SHA-256 recorded for it (re-hashed only if its size or mtime changed)."""
+    try:
+        return file_digest(path, record) == record.get("sha256")
+    except FileNotFoundError:
+        return False
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def expand_books(pattern=None):
+    """Resolve BOOKS globs into (pdf_path, output_dir, toc_path) triples."""
+    books = []
+    for book in BOOKS:
+        for pdf_path in sorted(glob.glob(os.path.join(ROOT, book["pdf"]))):
+            if pattern and not fnmatch.fnmatch(os.path.relpath(pdf_path, ROOT), pattern):
+                continue
+            stem = os.path.splitext(os.path.basename(pdf_path))[0]
+            output_dir = os.path.join(ROOT, book["output_dir"].format(stem=stem))
+            toc_path = os.path.join(ROOT, book["toc"]) if book.get("toc") else None
+            books.append((pdf_path, output_dir, toc_path))
+    return books
+
+
+def plan_book(pdf_path, output_dir, toc_path, force):
+    """Work out the section table of one book and which sections need writing.
+
+    The PDF is only parsed when it, or its fallback TOC, changed since the last run.
+    Sections are keyed by their name, which does not depend on their position,
+    so after a TOC change only those whose page range changed are rewritten.
+    A section is also rewritten when its file is missing or no longer has the
+    recorded hash (edited by hand, for instance), and every section when the
+    PDF itself changed or with force.
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    source = manifest.get("source", {})
+    toc = manifest.get("toc", {})
+    digest = file_digest(pdf_path, source)
+    toc_digest = file_digest(toc_path, toc) if toc_path else None
+    previous = manifest.get("sections", {})
+
+    reader = None
+    if not force and source.get("sha256") == digest and toc.get("sha256") == toc_digest and "table" in manifest:
+        total_pdf_pages = source["pages"]
+        entries = [tuple(e) for e in manifest["table"]]
+        origin = manifest["origin"]
+    else:
+        reader = PdfReader(pdf_path)
+        total_pdf_pages = len(reader.pages)
+        stem = os.path.splitext(os.path.basename(pdf_path))[0]
+        entries, origin = section_table(reader, toc_path, stem)
+
+    sections = section_ranges(entries, total_pdf_pages)
+    # Sections written from another version of the PDF are not reused
+    reusable = previous if not force and source.get("sha256") == digest else {}
+    todo = [s for s in sections
+            if reusable.get(s[1], {}).get("pages") != [s[3], s[4]]
+            or not output_current(os.path.join(output_dir, s[1] + ".pdf"), reusable[s[1]])]
+    return {
+        "pdf": pdf_path, "output_dir": output_dir, "toc": toc_path, "reader": reader,
+        "manifest_path": manifest_path, "digest": digest, "toc_digest": toc_digest,
+        "pages": total_pdf_pages, "entries": entries, "origin": origin,
+        "sections": sections, "todo": todo, "previous": previous,
+    }
+
+
+def save_manifest(plan, written):
+    """Record the source digests, the section table and each section's page range and output hash.
+
+    Outputs the previous manifest lists that are not in the new table are removed.
+    """
+    records = {}
+    done = {s[1] for s in plan["todo"]}
+    for i, filename, description, start_pdf_0, end_pdf_0 in plan["sections"]:
+        sha = written.get(filename) if filename in done else plan["previous"].get(filename, {}).get("sha256")
+        if start_pdf_0 <= end_pdf_0 and sha:
+            out_path = os.path.join(plan["output_dir"], filename + ".pdf")
+            record = file_record(out_path, sha)
+            del record["path"]
+            records[filename] = dict(record, pages=[start_pdf_0, end_pdf_0])
+    for filename in set(plan["previous"]) - set(records):
+        stale = os.path.join(plan["output_dir"], filename + ".pdf")
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    source = dict(file_record(plan["pdf"], plan["digest"]), pages=plan["pages"])
+    manifest = {
+        "source": source,
+        "toc": file_record(plan["toc"], plan["toc_digest"]) if plan["toc"] else {},
+        "origin": plan["origin"],
+        # Lists, as JSON gives them back, so the comparison below holds
+        "table": [list(entry) for entry in plan["entries"]],
+        "sections": records,
+    }
+    # A checkout gives every file a new mtime; the manifest is committed for
+    # ag/sections, so it is not rewritten for that alone
+    if without_stats(manifest) == without_stats(load_manifest(plan["manifest_path"])):
+        return
+    with open(plan["manifest_path"], "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+# Per-process caches used by --jobs workers; each worker parses a PDF at most once
+_worker_caches = {}
+
+
+def _split_chunk(task):
+    pdf_path, output_dir, chunk, total_entries = task
+    if pdf_path not in _worker_caches:
+        _worker_caches[pdf_path] = SharedObjectCache(PdfReader(pdf_path))
+    return split_sections(_worker_caches[pdf_path], chunk, output_dir, total_entries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="number of worker processes (0 = one per CPU)")
+    parser.add_argument("--force", action="store_true",
+                        help="ignore the manifests and rewrite every section")
+    parser.add_argument("--book", metavar="GLOB",
+                        help="only split PDFs whose repo-relative path matches, e.g. 'cf/*'")
+    args = parser.parse_args()
+    jobs = args.jobs or os.cpu_count()
+
+    plans = []
+    for pdf_path, output_dir, toc_path in expand_books(args.book):
+        os.makedirs(output_dir, exist_ok=True)
+        plan = plan_book(pdf_path, output_dir, toc_path, args.force)
+        plans.append(plan)
+
+    # Contiguous chunks keep neighbouring sections, which share boundary
+    # pages and fonts, in the same worker cache
+    tasks = []
+    for n, plan in enumerate(plans):
+        todo = plan["todo"]
+        chunk_size = max(1, -(-len(todo) // (jobs * 4))) if jobs > 1 else max(1, len(todo))
+        for k in range(0, len(todo), chunk_size):
+            tasks.append((n, (plan["pdf"], plan["output_dir"], todo[k:k + chunk_size], len(plan["entries"]))))
+
+    if jobs <= 1:
+        # One pass over each document; pages and resources shared between
+        # sections are serialized once and reused by every output file
+        for plan in plans:
+            if plan["reader"] is not None:
+                _worker_caches[plan["pdf"]] = SharedObjectCache(plan["reader"])
+        results = map(_split_chunk, (task for _, task in tasks))
+        pool = None
+    else:
+        # Results come back in submission order, so the log matches a sequential run
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        results = pool.map(_split_chunk, (task for _, task in tasks))
+
+    written = [{} for _ in plans]
+    results = iter(results)
+    task_index = 0
+    for n, plan in enumerate(plans):
+        print(f"{os.path.relpath(plan['pdf'], ROOT)}: {len(plan['entries'])} sections from {plan['origin']}, "
+              f"{plan['pages']} pages, {len(plan['sections']) - len(plan['todo'])} unchanged")
+        while task_index < len(tasks) and tasks[task_index][0] == n:
+            log, chunk_written = next(results)
+            for line in log:
+                print(line)
+            written[n].update(chunk_written)
+            task_index += 1
+        save_manifest(plan, written[n])
+    if pool is not None:
+        pool.shutdown()
+
+    print(f"\nDone! {len(plans)} book(s) split")
 
-    num_pages = end_pdf_0 - start_pdf_0 + 1
-    print(f"  [{i+1:3d}/{len(entries)}] {filename}.pdf  (printed p.{printed_page}, PDF p.{start_pdf_0+1}-{end_pdf_0+1}, {num_pages} pg) - {description}")
 
-print(f"\nDone! Files written to {OUTPUT_DIR}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Build the whole site: one entry point for the pipeline scripts
+
+Every step of the pipeline is a node of a dependency graph:
+
+    split:<pdf>    ag/split_pdf.py         a book's PDF -> section PDFs
+    images:ag      ag/extract_images.py    Reid.pdf -> ag/html/images/
+    cf:<doc>       cf/convert_pdf_to_html.py  cf/<doc>.pdf -> extracted text, images, cf/html/<doc>.html
+    cf:index       cf/convert_pdf_to_html.py  cf/html/index.html
+    vocab*         ch1/process_vocab.py    vocabulary annotation of every bilingual page
+    vendor*        cf/vendor_assets.py     pinned MathJax/three.js in assets/, pages pointed at them
+    search         ch1/search_index.py     full-text search index in search/index/
+
+A plain build leaves the committed pages as they are: it only writes
+files that are committed as its output (section PDFs, search index) or
+git-ignored. Steps that rewrite committed pages in place are opt-in and
+run only when named, as are cf:<doc> nodes whose page already exists
+(those pages have been edited by hand since they were generated), and
+cf:index unless some document has no page yet:
+
+    python build.py vocab         # annotate the bilingual pages
+    python build.py cf:ch3        # regenerate one page over its edits
+    python build.py vendor        # needs registry.npmjs.org
+
+A node runs its script when the stamp of its inputs, a digest of the
+content of every input file plus the node's command, differs from the one
+recorded after its last successful run, or when one of its outputs is
+missing. Inputs include the scripts themselves, so editing a script
+rebuilds what it makes. Nodes run after the nodes they depend on, as many
+at a time as --jobs allows; a change only rebuilds the nodes whose inputs
+it touches, directly or through the files an upstream node rewrites.
+
+Stamps are taken after a node runs, so steps that rewrite their inputs in
+place (vocabulary annotation) do not see their own changes as new work.
+File digests are cached by size and mtime in .build/state.json; each
+node's output goes to .build/logs/<node>.log.
+
+    python build.py               # everything that is out of date
+    python build.py cf:ch3 -n     # what rebuilding one chapter would run
+    python build.py --list        # every node; opt-in ones are marked *
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import argparse
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.path.join(ROOT, ".build")
+STATE_PATH = os.path.join(BUILD_DIR, "state.json")
+LOG_DIR = os.path.join(BUILD_DIR, "logs")
+
+# Modules the cf converter imports; a change to any of them rebuilds every page
+CF_SOURCES = ["cf/convert_pdf_to_html.py", "cf/extraction_cache.py", "cf/translation.py", "cf/prerender_math.py",
+              "cf/vendor_assets.py", "cf/site_css.py", "cf/site.css"]
+
+
+class Node:
+    """
+    One step: `command` run in `cwd` (relative to the repository root).
+    inputs are glob patterns whose files' contents make up the stamp;
+    listings are directories whose file names (not contents) do; outputs
+    must exist after a run; after names the nodes that must run first.
+    Nodes with default=False only run when named.
+    """
+
+    def __init__(self, name, command, cwd, inputs, outputs=(), after=(), listings=(), default=True):
+        self.name = name
+        self.command = command
+        self.cwd = cwd
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.after = list(after)
+        self.listings = list(listings)
+        self.default = default
+
+
+def site_graph():
+    """The nodes of the site build, in an order that respects their dependencies"""
+    python = sys.executable
+    for directory in ("ag", "ch1"):
+        sys.path.insert(0, os.path.join(ROOT, directory))
+    import split_pdf
+    import process_vocab
+    import search_index
+
+    nodes = []
+    for book in split_pdf.BOOKS:
+        for pdf_path in sorted(glob.glob(os.path.join(ROOT, book["pdf"]))):
+            rel = os.path.relpath(pdf_path, ROOT)
+            stem = os.path.splitext(os.path.basename(pdf_path))[0]
+            inputs = [rel, "ag/split_pdf.py"] + ([book["toc"]] if book.get("toc") else [])
+            manifest = os.path.join(book["output_dir"].format(stem=stem), split_pdf.MANIFEST_NAME)
+            nodes.append(Node(f"split:{rel}", [python, "split_pdf.py", "--book", rel], "ag", inputs, [manifest]))
+
+    nodes.append(Node("images:ag", [python, "extract_images.py"], "ag",
+                      ["ag/Reid.pdf", "ag/extract_images.py"], ["ag/html/images/images.json"]))
+
+    documents = []
+    new_pages = False
+    for pdf_path in sorted(glob.glob(os.path.join(ROOT, "cf", "*.pdf"))):
+        stem = os.path.splitext(os.path.basename(pdf_path))[0]
+        page = f"cf/html/{stem}.html"
+        documents.append(f"cf:{stem}")
+        nodes.append(Node(f"cf:{stem}", [python, "convert_pdf_to_html.py", stem, "--no-index", "--jobs", "1"], "cf",
+                          [f"cf/{stem}.pdf"] + CF_SOURCES, [page, f"cf/{stem}_extracted.txt"],
+                          default=not os.path.exists(os.path.join(ROOT, page))))
+        new_pages = new_pages or nodes[-1].default
+    # The committed index is dated and lists the pages as they are; it is
+    # regenerated along with a new page
+    nodes.append(Node("cf:index", [python, "convert_pdf_to_html.py", "--index-only"], "cf",
+                      CF_SOURCES, ["cf/html/index.html"], after=documents,
+                      listings=["cf/html", "cf/html/images"], default=new_pages))
+
+    pages = [pattern for patterns in process_vocab.BOOKS.values() for pattern in patterns]
+    nodes.append(Node("vocab", [python, "process_vocab.py"], "ch1",
+                      pages + ["ch1/process_vocab.py", "ch1/glossary.py", "ch1/glossary/*"],
+                      [os.path.relpath(process_vocab.INDEX_PATH, ROOT)], after=documents + ["cf:index"],
+                      default=False))
+
+    # Rewrites every page of the site, so it comes after everything that writes one
+    nodes.append(Node("vendor", [python, "vendor_assets.py", "fetch", "--rewrite"], "cf",
+                      ["cf/vendor_assets.py"], ["assets/assets.json"],
+                      after=documents + ["cf:index", "vocab"], default=False))
+
+    pages = [pattern for patterns in search_index.BOOKS.values() for pattern in patterns]
+    nodes.append(Node("search", [python, "search_index.py"], "ch1",
+                      pages + ["ch1/search_index.py", "ch1/process_vocab.py"],
+                      [os.path.relpath(os.path.join(search_index.INDEX_DIR, "meta.json"), ROOT)],
+                      after=documents + ["cf:index", "vocab"]))
+    return nodes
+
+
+class State:
+    """Recorded stamps, and file digests cached by size and mtime"""
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            data = {}
+        self.stamps = data.get("stamps", {})
+        self.files = data.get("files", {})
+
+    def digest(self, rel):
+        path = os.path.join(ROOT, rel)
+        st = os.stat(path)
+        cached = self.files.get(rel)
+        if cached and cached["size"] == st.st_size and cached["mtime_ns"] == st.st_mtime_ns:
+            return cached["sha256"]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.files[rel] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": h.hexdigest()}
+        return h.hexdigest()
+
+    def stamp(self, node):
+        """Digest of the node's command, its input files' contents and its listings' file names"""
+        h = hashlib.sha256(json.dumps([node.command[1:], node.cwd]).encode("utf-8"))
+        files = set()
+        for pattern in node.inputs:
+            files.update(os.path.relpath(path, ROOT) for path in glob.glob(os.path.join(ROOT, pattern))
+                         if os.path.isfile(path))
+        for rel in sorted(files):
+            h.update(f"{rel}\0{self.digest(rel)}\n".encode("utf-8"))
+        for directory in node.listings:
+            names = sorted(os.listdir(os.path.join(ROOT, directory))) if os.path.isdir(os.path.join(ROOT, directory)) else []
+            h.update(f"{directory}\0{json.dumps(names)}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"stamps": self.stamps, "files": self.files}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+def is_current(node, state):
+    return (state.stamps.get(node.name) == state.stamp(node)
+            and all(os.path.exists(os.path.join(ROOT, output)) for output in node.outputs))
+
+
+def select(nodes, targets):
+    """
+    The targets (names, or prefixes such as "cf" or "split"; none: every
+    default node) and the default nodes they depend on. An opt-in node
+    another one comes after is only run when it is selected itself.
+    """
+    by_name = {node.name: node for node in nodes}
+    wanted = set()
+    pending = [node.name for node in nodes
+               if (node.default if not targets else
+                   any(node.name == t or node.name.startswith(t.rstrip(":") + ":") for t in targets))]
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(dep for dep in by_name[name].after if by_name[dep].default)
+    return [node for node in nodes if node.name in wanted]
+
+
+def run_node(node):
+    """Run a node's command, logging its output; returns (ok, seconds)"""
+    os.makedirs(LOG_DIR, exist_ok=True)
+    start = time.monotonic()
+    with open(os.path.join(LOG_DIR, node.name.replace("/", "_").replace(":", "_") + ".log"), "w",
+              encoding="utf-8") as log:
+        result = subprocess.run(node.command, cwd=os.path.join(ROOT, node.cwd),
+                                stdout=log, stderr=subprocess.STDOUT)
+    return result.returncode == 0, time.monotonic() - start
+
+
+def build(nodes, state, jobs=1, force=False, dry_run=False):
+    """
+    Run the out-of-date nodes, each once the nodes it comes after are done.
+    A failed node's dependents are not run. Returns {name: status}.
+    """
+    status = {}  # name -> "built", "current", "failed", "blocked" or "would build"
+    remaining = list(nodes)
+    running = {}  # future -> node
+
+    def settle(node, result):
+        status[node.name] = result
+        if result == "built":
+            state.stamps[node.name] = state.stamp(node)
+            state.save()
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while remaining or running:
+            for node in list(remaining):
+                deps = [status.get(name) for name in node.after if any(n.name == name for n in nodes)]
+                if any(dep is None for dep in deps):
+                    continue
+                remaining.remove(node)
+                if any(dep in ("failed", "blocked") for dep in deps):
+                    status[node.name] = "blocked"
+                    print(f"✗ {node.name}: not run, a dependency failed")
+                elif not force and not any(dep in ("built", "would build") for dep in deps) and is_current(node, state):
+                    status[node.name] = "current"
+                elif dry_run:
+                    status[node.name] = "would build"
+                    print(f"• {node.name}: {' '.join(node.command[1:])}")
+                elif len(running) < max(1, jobs):
+                    print(f"… {node.name}")
+                    running[pool.submit(run_node, node)] = node
+                else:
+                    remaining.insert(0, node)
+                    break
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node = running.pop(future)
+                ok, seconds = future.result()
+                settle(node, "built" if ok else "failed")
+                print(f"{'✓' if ok else '✗'} {node.name} ({seconds:.1f}s)"
+                      + ("" if ok else f", see {os.path.relpath(LOG_DIR, ROOT)}/"))
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="*",
+                        help="nodes to bring up to date, by name or prefix (default: all)")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(),
+                        help="number of nodes run at once")
+    parser.add_argument("--force", action="store_true", help="run the selected nodes even if up to date")
+    parser.add_argument("--dry-run", "-n", action="store_true", help="only list the nodes that would run")
+    parser.add_argument("--list", action="store_true", help="list the nodes and whether they are up to date")
+    args = parser.parse_args()
+
+    state = State()
+    graph = site_graph()
+    nodes = graph if args.list and not args.targets else select(graph, args.targets)
+    if args.list:
+        for node in nodes:
+            after = f" (after {', '.join(node.after)})" if node.after else ""
+            print(f"{'current' if is_current(node, state) else 'stale':<8} "
+                  f"{node.name}{'' if node.default else '*'}{after}")
+        state.save()
+        return 0
+
+    start = time.monotonic()
+    status = build(nodes, state, args.jobs, args.force, args.dry_run)
+    state.save()
+    counts = {}
+    for result in status.values():
+        counts[result] = counts.get(result, 0) + 1
+    print(f"\n{', '.join(f'{n} {result}' for result, n in sorted(counts.items()))} "
+          f"in {time.monotonic() - start:.1f}s")
+    return 0 if not counts.get("failed") and not counts.get("blocked") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
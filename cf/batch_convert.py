@@ -1,11 +1,27 @@
 #!/usr/bin/env python3
 """
 Batch convert remaining PDF chapters to bilingual HTML
+
+The text comes from the extraction cache (ch{n}_extracted.txt) that
+convert_pdf_to_html.py maintains; a chapter's PDF is only read again when
+its cache is missing or stale. Each chapter is split at the section
+numbers found in its text ("6.1. Cauchy's Integral Formula. Suppose ..."),
+and the chapters are converted in parallel. The pages in html/ carry
+hand-written translations, so pages that exist are only replaced when
+named or with --force.
 """
 
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import html
 import re
 from pathlib import Path
 
+from convert_pdf_to_html import CHINESE_NUMERALS, DOCUMENTS, iter_lines, iter_pdf_pages, translation_memory
+from prerender_math import MathRenderError, MathRenderer, prerender_files
+from site_css import stylesheet_link
+from vendor_assets import load_manifest, self_host
+
 # HTML template
 HTML_TEMPLATE = '''<!DOCTYPE html>
 <html lang="en">
@@ -13,99 +29,8 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{title}</title>
-    <script src="https://polyfill.io/v3/polyfill.min.js?features=es6"></script>
     <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"></script>
-    <style>
-        body {{
-            font-family: "Computer Modern", "Latin Modern Roman", Georgia, serif;
-            line-height: 1.8;
-            max-width: 900px;
-            margin: 0 auto;
-            padding: 20px;
-            background-color: #f9f9f9;
-            color: #333;
-        }}
-        .content {{
-            background-color: white;
-            padding: 40px;
-            border-radius: 8px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        h1 {{
-            text-align: center;
-            font-size: 2.5em;
-            margin-bottom: 0.3em;
-            color: #2c3e50;
-            border-bottom: 3px solid #3498db;
-            padding-bottom: 0.3em;
-        }}
-        h2 {{
-            font-size: 1.8em;
-            margin-top: 2em;
-            margin-bottom: 1em;
-            color: #2c3e50;
-        }}
-        h3 {{
-            font-size: 1.3em;
-            margin-top: 1.5em;
-            color: #34495e;
-        }}
-        p {{
-            margin: 1em 0;
-            text-align: justify;
-        }}
-        blockquote {{
-            border-left: 4px solid #3498db;
-            margin: 1em 0;
-            padding: 0.5em 1em;
-            background-color: #ecf0f1;
-            font-style: normal;
-            color: #555;
-        }}
-        .exercises {{
-            background-color: #f8f9fa;
-            padding: 1.5em;
-            margin: 2em 0;
-            border-left: 4px solid #e74c3c;
-            border-radius: 4px;
-        }}
-        .exercises h3 {{
-            color: #e74c3c;
-            margin-top: 0;
-        }}
-        .exercise-item {{
-            margin: 1em 0;
-            padding-left: 1.5em;
-        }}
-        .example {{
-            background-color: #fff9e6;
-            padding: 1em;
-            margin: 1.5em 0;
-            border-left: 4px solid #f39c12;
-            border-radius: 4px;
-        }}
-        .example-title {{
-            font-weight: bold;
-            color: #f39c12;
-            margin-bottom: 0.5em;
-        }}
-        .figure {{
-            text-align: center;
-            margin: 2em 0;
-        }}
-        .figure img {{
-            max-width: 100%;
-            height: auto;
-            border: 1px solid #ddd;
-            border-radius: 4px;
-            padding: 5px;
-        }}
-        .figure-caption {{
-            font-style: italic;
-            color: #666;
-            margin-top: 0.5em;
-        }}
-    </style>
+    {stylesheet}
 </head>
 <body>
     <div class="content">
@@ -115,113 +40,186 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
 </html>
 '''
 
-# Chapter metadata
-CHAPTERS = {
-    6: {
-        "title": "More Integration",
-        "chinese": "更多积分内容",
-        "sections": [
-            ("6.1", "Cauchy's Integral Formula", "柯西积分公式"),
-            ("6.2", "Derivatives", "导数"),
-            ("6.3", "Liouville's Theorem", "刘维尔定理"),
-        ]
-    },
-    7: {
-        "title": "Series",
-        "chinese": "级数",
-        "sections": [
-            ("7.1", "Power Series", "幂级数"),
-            ("7.2", "Taylor Series", "泰勒级数"),
-        ]
-    },
-    8: {
-        "title": "Residues",
-        "chinese": "留数",
-        "sections": [
-            ("8.1", "Laurent Series", "洛朗级数"),
-            ("8.2", "Residues", "留数"),
-            ("8.3", "The Residue Theorem", "留数定理"),
-        ]
-    },
-    9: {
-        "title": "Applications",
-        "chinese": "应用",
-        "sections": [
-            ("9.1", "Real Integrals", "实积分"),
-            ("9.2", "Argument Principle", "辐角原理"),
-        ]
-    },
-    10: {
-        "title": "Conformal Mappings",
-        "chinese": "保角映射",
-        "sections": [
-            ("10.1", "Conformal Mappings", "保角映射"),
-            ("10.2", "Linear Fractional Transformations", "线性分式变换"),
-        ]
-    },
-    11: {
-        "title": "Harmonic Functions",
-        "chinese": "调和函数",
-        "sections": [
-            ("11.1", "Harmonic Functions", "调和函数"),
-            ("11.2", "The Dirichlet Problem", "狄利克雷问题"),
-        ]
-    }
-}
-
-def create_chapter_html(chapter_num, chapter_data, extracted_file):
-    """Create HTML for a chapter"""
-    # Read extracted text
-    with open(extracted_file, 'r', encoding='utf-8') as f:
-        text = f.read()
+# Chapters converted from their extracted text; titles come from DOCUMENTS
+CHAPTERS = [6, 7, 8, 9, 10, 11]
+
+# Page labels ("6.1" at the foot of the first page of chapter 6)
+PAGE_LABEL = re.compile(r"\d+\.\d+$")
+
+# The chapter heading on the first page, followed by the chapter title
+CHAPTER_HEADING = re.compile(r"Chapter\s*[A-Z][a-z]+$")
+
+# A word of prose: a letter followed by lower-case letters ("dA" is not one)
+PROSE_WORD = re.compile(r"[A-Za-z][a-z]+\W*$")
+
+def section_pattern(chapter_num, section_num):
+    """Match the run-in heading of a section: "6.1. Title. Text" or "8.2 Title. Text" """
+    return re.compile(rf"{chapter_num}\.{section_num}\.?\s*(?P<title>[A-Z][^.]*)\.\s*(?P<text>.*)")
+
+def is_prose(line):
+    """
+    Whether a line reads as text rather than the remains of a formula:
+    extraction drops most math symbols, leaving lines like "k T  dA." or "S"
+    """
+    words = line.split()
+    prose = [word for word in words if PROSE_WORD.match(word)]
+    return len(prose) >= 2 and 2 * len(prose) >= len(words)
+
+def iter_section_paragraphs(lines, chapter_num):
+    """
+    Split a chapter's lines at its section headings and reflow them into
+    paragraphs, in one pass. Sections are looked for in order ("7.1", then
+    "7.2", ...), so a later cross-reference to "7.1" does not open it
+    again. Yields (section, paragraph) pairs, section being None before the
+    first heading and (number, title) after.
+    """
+    section_num = 1
+    heading = section_pattern(chapter_num, section_num)
+    current = None
+    paragraph = []
+    width = 0  # longest line so far, to tell the last line of a paragraph
+    skip_title = False
+
+    for line in lines:
+        if PAGE_LABEL.match(line):
+            continue
+        if skip_title:
+            skip_title = False
+            continue
+        if current is None and CHAPTER_HEADING.match(line):
+            skip_title = True
+            continue
+
+        match = heading.match(line)
+        if match:
+            if paragraph:
+                yield current, " ".join(paragraph)
+                paragraph = []
+            current = (f"{chapter_num}.{section_num}", match.group("title"))
+            section_num += 1
+            heading = section_pattern(chapter_num, section_num)
+            line = match.group("text")
+            if not line:
+                continue
+
+        paragraph.append(line)
+        width = max(width, len(line))
+        # A short line of prose ending a sentence closes the paragraph;
+        # formula remnants stay inside the paragraph around them
+        if line.endswith(('.', '?', '!')) and len(line) < 0.8 * width and is_prose(line):
+            yield current, " ".join(paragraph)
+            paragraph = []
+
+    if paragraph:
+        yield current, " ".join(paragraph)
+
+def paragraph_html(text, translation):
+    """A paragraph followed by its Chinese translation"""
+    chunk = f'        <p>{html.escape(text)}</p>\n\n'
+    chunk += '        <blockquote>\n'
+    chunk += f'            <p>{html.escape(translation)}</p>\n'
+    chunk += '        </blockquote>\n\n'
+    return chunk
+
+def create_chapter_html(chapter_num, pdf_file, output_file):
+    """Create HTML for a chapter from its extracted text, to be written to output_file"""
+    _, title, chinese_title = DOCUMENTS[f"ch{chapter_num}"]
+    by_section = {None: []}
+    for section, text in iter_section_paragraphs(iter_lines(iter_pdf_pages(pdf_file)), chapter_num):
+        by_section.setdefault(section, []).append(text)
+
+    sections = [section for section in by_section if section is not None]
+    texts = [section_title for _, section_title in sections]
+    texts += [text for paragraphs in by_section.values() for text in paragraphs]
+    translations = dict(zip(texts, translation_memory.translate(texts)))
 
     # Build content
-    content = f'        <h1>Chapter {chapter_num}<br>{chapter_data["title"]}</h1>\n\n'
+    content = f'        <h1>Chapter {chapter_num}<br>{title}</h1>\n\n'
     content += '        <blockquote>\n'
-    content += f'            <h1 style="text-align: center; font-size: 2.2em;">第{chapter_num}章<br>{chapter_data["chinese"]}</h1>\n'
+    content += ('            <h1 style="text-align: center; font-size: 2.2em;">'
+                f'第{CHINESE_NUMERALS.get(chapter_num, chapter_num)}章<br>{chinese_title}</h1>\n')
     content += '        </blockquote>\n\n'
 
-    # Simple content extraction (in real implementation, would parse more carefully)
-    # For now, create placeholder structure with key content
-    content += f'        <p>This chapter covers {chapter_data["title"].lower()} in complex analysis.</p>\n\n'
-    content += f'        <blockquote>\n'
-    content += f'            <p>本章介绍复分析中的{chapter_data["chinese"]}。</p>\n'
-    content += f'        </blockquote>\n\n'
+    for text in by_section[None]:
+        content += paragraph_html(text, translations[text])
 
     # Add sections
-    for sec_num, sec_en, sec_cn in chapter_data.get("sections", []):
-        content += f'        <h2>{sec_num} {sec_en}</h2>\n\n'
-        content += f'        <p>[Content for {sec_en} section]</p>\n\n'
-        content += f'        <blockquote>\n'
-        content += f'            <p>[{sec_cn}部分的内容]</p>\n'
-        content += f'        </blockquote>\n\n'
+    for section in sections:
+        number, section_title = section
+        content += f'        <h2>{number} {html.escape(section_title)}</h2>\n'
+        content += f'        <blockquote><h2>{number} {html.escape(translations[section_title])}</h2></blockquote>\n\n'
+        for text in by_section[section]:
+            content += paragraph_html(text, translations[text])
 
     # Create HTML
-    html = HTML_TEMPLATE.format(
-        title=f"Chapter {chapter_num}: {chapter_data['title']}",
+    return HTML_TEMPLATE.format(
+        title=f"Chapter {chapter_num}: {title}",
+        stylesheet=stylesheet_link(output_file),
         content=content
     )
 
-    return html
+def convert_chapter(ch_num, pdf_file, output_file):
+    """Worker: write one chapter's HTML"""
+    html_content = create_chapter_html(ch_num, pdf_file, output_file)
+    manifest = load_manifest()
+    if manifest is not None:
+        html_content = self_host(html_content, output_file, manifest)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write(html_content)
 
-# Main execution
-if __name__ == "__main__":
-    base_dir = Path("/Users/shishengli/pairings-for-beginners/cf")
-    html_dir = base_dir / "html"
+def main():
+    parser = argparse.ArgumentParser(description="Convert chapters 6-11 from their extracted text")
+    parser.add_argument("chapters", nargs="*", type=int,
+                        help="chapter numbers to convert (default: all in CHAPTERS)")
+    parser.add_argument("--jobs", "-j", type=int, default=len(CHAPTERS),
+                        help="number of chapters converted at once")
+    parser.add_argument("--prerender-math", action="store_true",
+                        help="typeset the TeX of the pages to SVG now instead of in the browser")
+    parser.add_argument("--force", action="store_true",
+                        help="overwrite existing pages when no chapters are named")
+    args = parser.parse_args()
 
-    for ch_num, ch_data in CHAPTERS.items():
-        extracted_file = base_dir / f"ch{ch_num}_extracted.txt"
-        output_file = html_dir / f"ch{ch_num}.html"
+    base_dir = Path(__file__).resolve().parent
+    html_dir = base_dir / "html"
 
-        if extracted_file.exists():
-            print(f"Creating ch{ch_num}.html...")
-            html_content = create_chapter_html(ch_num, ch_data, extracted_file)
+    created = []
+    futures = {}
+    existing = []
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        for ch_num in args.chapters or CHAPTERS:
+            pdf_file = base_dir / f"ch{ch_num}.pdf"
+            output_file = html_dir / f"ch{ch_num}.html"
+            if ch_num not in CHAPTERS or not pdf_file.exists():
+                print(f"✗ Missing {pdf_file}")
+                continue
+            # The pages in html/ carry hand-written translations; only
+            # replace them when asked to
+            if not args.chapters and not args.force and output_file.exists():
+                existing.append(f"ch{ch_num}")
+                continue
+            futures[ch_num] = (output_file, pool.submit(convert_chapter, ch_num, pdf_file, output_file))
 
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(html_content)
+        if existing:
+            print(f"Skipping {len(existing)} chapter(s) whose page exists: {', '.join(existing)} "
+                  "(name them or pass --force to overwrite)")
+        for ch_num, (output_file, future) in futures.items():
+            try:
+                future.result()
+                created.append(output_file)
+                print(f"✓ Created {output_file}")
+            except Exception as e:
+                print(f"✗ ch{ch_num}: {type(e).__name__}: {e}")
 
-            print(f"✓ Created {output_file}")
-        else:
-            print(f"✗ Missing {extracted_file}")
+    if args.prerender_math:
+        renderer = MathRenderer()
+        try:
+            prerender_files(created, renderer)
+            print(f"✓ Math pre-rendered: {renderer.stats()}")
+        except MathRenderError as e:
+            print(f"✗ Math pre-rendering failed: {e}")
 
     print("\nBatch conversion complete!")
+
+# Main execution
+if __name__ == "__main__":
+    main()
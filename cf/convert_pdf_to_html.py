@@ -5,12 +5,27 @@ Converts PDF files to HTML with English and Chinese content
 """
 
 import pdfplumber
-import pypdf
+from pdfminer.pdftypes import PDFStream, resolve1
+from pdfminer.psparser import literal_name
 from pathlib import Path
 from PIL import Image
+from datetime import date
+import numpy as np
+import argparse
+import asyncio
 import io
+import multiprocessing
+import multiprocessing.connection
 import re
 import os
+import sys
+import time
+
+from extraction_cache import CacheWriter, read_cache, read_images, write_images
+from prerender_math import MathRenderError, MathRenderer, prerender_files
+from site_css import stylesheet_link
+from translation import BACKENDS, MEMORY_PATH, TranslationMemory
+from vendor_assets import load_manifest, self_host
 
 # HTML template matching ch1.html and ch2.html style
 HTML_TEMPLATE = '''<!DOCTYPE html>
@@ -19,105 +34,8 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>{title}</title>
-    <script src="https://polyfill.io/v3/polyfill.min.js?features=es6"></script>
     <script id="MathJax-script" async src="https://cdn.jsdelivr.net/npm/mathjax@3/es5/tex-mml-chtml.js"></script>
-    <style>
-        body {{
-            font-family: "Computer Modern", "Latin Modern Roman", Georgia, serif;
-            line-height: 1.8;
-            max-width: 900px;
-            margin: 0 auto;
-            padding: 20px;
-            background-color: #f9f9f9;
-            color: #333;
-        }}
-        .content {{
-            background-color: white;
-            padding: 40px;
-            border-radius: 8px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-        }}
-        h1 {{
-            text-align: center;
-            font-size: 2.5em;
-            margin-bottom: 0.3em;
-            color: #2c3e50;
-            border-bottom: 3px solid #3498db;
-            padding-bottom: 0.3em;
-        }}
-        h2 {{
-            font-size: 1.8em;
-            margin-top: 2em;
-            margin-bottom: 1em;
-            color: #2c3e50;
-        }}
-        h3 {{
-            font-size: 1.3em;
-            margin-top: 1.5em;
-            color: #34495e;
-        }}
-        p {{
-            margin: 1em 0;
-            text-align: justify;
-        }}
-        blockquote {{
-            border-left: 4px solid #3498db;
-            margin: 1em 0;
-            padding: 0.5em 1em;
-            background-color: #ecf0f1;
-            font-style: normal;
-            color: #555;
-        }}
-        .exercises {{
-            background-color: #f8f9fa;
-            padding: 1.5em;
-            margin: 2em 0;
-            border-left: 4px solid #e74c3c;
-            border-radius: 4px;
-        }}
-        .exercises h3 {{
-            color: #e74c3c;
-            margin-top: 0;
-        }}
-        .exercise-item {{
-            margin: 1em 0;
-            padding-left: 1.5em;
-        }}
-        .example {{
-            background-color: #fff9e6;
-            padding: 1em;
-            margin: 1.5em 0;
-            border-left: 4px solid #f39c12;
-            border-radius: 4px;
-        }}
-        .example-title {{
-            font-weight: bold;
-            color: #f39c12;
-            margin-bottom: 0.5em;
-        }}
-        .figure {{
-            text-align: center;
-            margin: 2em 0;
-        }}
-        .figure img {{
-            max-width: 100%;
-            height: auto;
-            border: 1px solid #ddd;
-            border-radius: 4px;
-            padding: 5px;
-        }}
-        .figure-caption {{
-            font-style: italic;
-            color: #666;
-            margin-top: 0.5em;
-        }}
-        code {{
-            background-color: #f4f4f4;
-            padding: 2px 6px;
-            border-radius: 3px;
-            font-family: "Courier New", monospace;
-        }}
-    </style>
+    {stylesheet}
 </head>
 <body>
     <div class="content">
@@ -128,115 +46,577 @@ HTML_TEMPLATE = '''<!DOCTYPE html>
 '''
 
 
+# Course documents in reading order: PDF stem -> (chapter number, title, Chinese title)
+DOCUMENTS = {
+    "ca": (None, "Course Introduction", "课程介绍"),
+    "ch1": (1, "Complex Numbers", "复数"),
+    "ch2": (2, "Complex Functions", "复变函数"),
+    "ch3": (3, "Elementary Functions", "初等函数"),
+    "ch4": (4, "Integration", "积分"),
+    "ch5": (5, "Cauchy's Theorem", "柯西定理"),
+    "ch6": (6, "More Integration", "更多积分内容"),
+    "ch7": (7, "Harmonic Functions", "调和函数"),
+    "ch8": (8, "Series", "级数"),
+    "ch9": (9, "Taylor and Laurent Series", "泰勒级数与洛朗级数"),
+    "ch10": (10, "Poles, Residues, and All That", "极点、留数及其他"),
+    "ch11": (11, "Argument Principle", "辐角原理"),
+    "supplement": (None, "Supplement: Applications of the Residue Theorem", "补充：留数定理的应用"),
+}
+
+CHINESE_NUMERALS = {
+    1: "一", 2: "二", 3: "三", 4: "四", 5: "五", 6: "六",
+    7: "七", 8: "八", 9: "九", 10: "十", 11: "十一", 12: "十二",
+}
+
+# Table of contents page written after a batch run
+INDEX_TEMPLATE = '''<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Complex Functions Course - Table of Contents</title>
+{stylesheet}
+</head>
+<body>
+<div class="content">
+<h1>Complex Functions Course<br>复变函数课程</h1>
+<p style="text-align:center"><a href="../../search/index.html">全站搜索 Search</a></p>
+
+<div class="intro">
+<p><strong>Welcome to the Bilingual Complex Functions Course Materials</strong></p>
+<p>This collection provides complete bilingual (English-Chinese) HTML versions of the "Pairings for Beginners" complex analysis course materials. All content includes LaTeX-formatted mathematics rendered with MathJax.</p>
+<p><strong>欢迎来到双语复变函数课程材料</strong></p>
+<p>本集合提供"初学者配对"复分析课程材料的完整双语(英语-中文)HTML版本。所有内容都包含使用MathJax渲染的LaTeX格式数学公式。</p>
+</div>
+
+<div class="stats">
+<div class="stat-box">
+<div class="stat-number">{chapter_count}</div>
+<div class="stat-label">Total Chapters<br>总章节数</div>
+</div>
+<div class="stat-box">
+<div class="stat-number">{image_count}</div>
+<div class="stat-label">Images<br>图片</div>
+</div>
+<div class="stat-box">
+<div class="stat-number">100%</div>
+<div class="stat-label">Bilingual<br>双语</div>
+</div>
+</div>
+
+<h2>Table of Contents 目录</h2>
+
+<ul class="toc">
+{toc}</ul>
+
+<div class="intro" style="margin-top:3em">
+<p><strong>Features 特性</strong></p>
+<ul>
+<li>Complete bilingual content (English + Chinese) 完整双语内容</li>
+<li>LaTeX mathematics rendered with MathJax 使用MathJax渲染的LaTeX数学</li>
+<li>Embedded images and figures 嵌入的图片和图表</li>
+<li>Responsive design for mobile devices 移动设备响应式设计</li>
+<li>Consistent professional styling 一致的专业样式</li>
+</ul>
+</div>
+
+<p style="text-align:center;margin-top:3em;color:#666">
+<small>Generated from original PDF course materials | 从原始PDF课程材料生成<br>
+{month} | {month_cn}</small>
+</p>
+
+</div>
+</body>
+</html>
+'''
+
+
+def image_from_stream(stream):
+    """Build a PIL image from a pdfminer image XObject stream"""
+    attrs = stream.attrs
+    width = resolve1(attrs['Width'])
+    height = resolve1(attrs['Height'])
+    data = stream.get_data()
+
+    # Determine color space and build PIL image
+    cs = resolve1(attrs.get('ColorSpace'))
+    bpc = resolve1(attrs.get('BitsPerComponent', 8))
+
+    # Resolve indirect color space references
+    if isinstance(cs, list):
+        cs_name = literal_name(resolve1(cs[0])) if cs else 'DeviceGray'
+    else:
+        cs_name = literal_name(cs) if cs else 'DeviceGray'
+
+    if cs_name == 'Indexed':
+        # Indexed (palette) color space
+        palette_data = resolve1(cs[3])
+        if isinstance(palette_data, PDFStream):
+            palette_data = palette_data.get_data()
+        if isinstance(palette_data, str):
+            palette_data = palette_data.encode('latin-1')
+
+        img = Image.frombytes('P', (width, height), data)
+        # Set palette (RGB)
+        palette = list(palette_data)
+        # Pad palette to 256 entries (768 bytes for RGB)
+        while len(palette) < 768:
+            palette.append(0)
+        img.putpalette(palette[:768])
+        img = img.convert('RGBA')
+    elif cs_name == 'DeviceCMYK':
+        img = Image.frombytes('CMYK', (width, height), data)
+        img = img.convert('RGB')
+    elif cs_name == 'DeviceRGB':
+        img = Image.frombytes('RGB', (width, height), data)
+    else:
+        # Default: grayscale
+        if bpc == 1:
+            img = Image.frombytes('1', (width, height), data)
+        else:
+            img = Image.frombytes('L', (width, height), data)
+    return img
+
+
+def save_page_images(page, page_num, output_dir, prefix="fig"):
+    """Save the images drawn on a pdfplumber page as PNG, return [(page_num, filename)]"""
+    images = []
+    seen = set()
+    for image in page.images:
+        name = image['name']
+        if name in seen:
+            continue
+        seen.add(name)
+        try:
+            img_filename = f"{prefix}_p{page_num + 1}_{name}.png"
+            image_from_stream(image['stream']).save(output_dir / img_filename, 'PNG')
+            images.append((page_num, img_filename))
+        except Exception as e:
+            print(f"Could not extract image from page {page_num + 1}: {e}")
+    return images
+
+
+# Fonts whose glyphs are mathematics (MathType's Tci fonts, TeX's math
+# fonts); italic text fonts set single-letter variables
+MATH_FONT = re.compile(r'Tci\d|CMMI|CMSY|CMEX|Symbol|Math', re.IGNORECASE)
+ITALIC_FONT = re.compile(r'Italic|Oblique|CMTI|CMMI', re.IGNORECASE)
+
+# Private-use glyphs of the math fonts whose meaning is unambiguous
+MATH_GLYPHS = {
+    "Tci1": {"\uf03d": "=", "\uf02b": "+", "\uf03c": "<", "\uf03e": ">", "\uf0b8": r"\to ",
+             "\uf0b1": r"\pm ", "\uf075": r"\cdots "},
+    "Tci2": {"\uf03f": "-", "\uf058": r"\int ", "\uf02f": r"\partial ", "\uf03e": r"\sum ",
+             "\uf04b": r"\infty ", "\uf0b2": r"\leq ", "\uf0b3": r"\geq ", "\uf0ae": r"\neq "},
+    "Tci3": {"\uf0dd": "(", "\uf0de": ")", "\uf0df": "[", "\uf0e0": "]", "\uf0e1": r"\{", "\uf0e2": r"\}"},
+    "Tci1Italic": {"\uf053": r"\theta ", "\uf05e": r"\pi "},
+    "TT213t00": {"\ue0a2": "(", "\ue0a3": ")", "\ue0a4": "[", "\ue0a5": "]", "\ue0a6": r"\{", "\ue0a7": r"\}"},
+}
+
+TRAILING_PUNCTUATION = ".,;:"
+
+
+def _glyph(char):
+    """The LaTeX for a character of a math font"""
+    font = char["fontname"].split("+")[-1]
+    return MATH_GLYPHS.get(font, {}).get(char["text"], char["text"])
+
+
+def _render_word(chars, kinds, scripts):
+    """
+    Text of one word. kinds[i] is "math" or "text"; scripts[i] is -1 for a
+    subscript, 1 for a superscript, 0 on the baseline.
+    """
+    out = []
+    i = 0
+    while i < len(chars):
+        j = i
+        while j < len(chars) and scripts[j] == scripts[i]:
+            j += 1
+        piece = "".join(_glyph(c) if k == "math" else c["text"] for c, k in zip(chars[i:j], kinds[i:j]))
+        if scripts[i]:
+            piece = ("_{" if scripts[i] < 0 else "^{") + piece + "}"
+        out.append(piece)
+        i = j
+    return "".join(out)
+
+
+def layout_lines(chars):
+    """
+    Group a page's characters into lines, vectorized over their positions
+    and sizes. Returns [(text, style)] in reading order, style being
+    "heading" for lines set larger than the body text and "body" otherwise.
+    Smaller characters above or below a line become its superscripts and
+    subscripts, and runs in math fonts (or single italic letters) are
+    wrapped in \\( ... \\).
+    """
+    n = len(chars)
+    if n == 0:
+        return []
+    x0 = np.fromiter((c["x0"] for c in chars), float, n)
+    x1 = np.fromiter((c["x1"] for c in chars), float, n)
+    bottom = np.fromiter((c["bottom"] for c in chars), float, n)
+    size = np.fromiter((c["size"] for c in chars), float, n)
+
+    # Body size: the size most characters are set in
+    sizes, counts = np.unique(np.round(size, 1), return_counts=True)
+    body = sizes[np.argmax(counts)]
+    small = size < 0.85 * body
+
+    # Lines: full-size characters whose baselines are within half a body size
+    full = np.flatnonzero(~small)
+    if full.size == 0:
+        full, small = np.arange(n), np.zeros(n, bool)
+    order = full[np.argsort(bottom[full], kind="stable")]
+    breaks = np.flatnonzero(np.diff(bottom[order]) > 0.5 * body) + 1
+    groups = np.split(order, breaks)
+    baselines = np.array([np.median(bottom[g]) for g in groups])
+
+    # Small characters join the nearest line if close enough, as scripts;
+    # the rest (footnotes, captions) form lines of their own
+    line_of = np.empty(n, int)
+    for k, g in enumerate(groups):
+        line_of[g] = k
+    script = np.zeros(n, int)
+    small_idx = np.flatnonzero(small)
+    if small_idx.size:
+        b = bottom[small_idx]
+        pos = np.searchsorted(baselines, b)
+        lo = np.clip(pos - 1, 0, len(baselines) - 1)
+        hi = np.clip(pos, 0, len(baselines) - 1)
+        nearest = np.where(np.abs(b - baselines[lo]) <= np.abs(b - baselines[hi]), lo, hi)
+        offset = b - baselines[nearest]
+        attached = np.abs(offset) < 0.8 * body
+        line_of[small_idx] = nearest
+        # Raised well above the baseline: superscript; otherwise subscript
+        script[small_idx] = np.where(~attached, 0, np.where(offset < -0.2 * body, 1, -1))
+        loose = small_idx[~attached]
+        if loose.size:
+            loose = loose[np.argsort(bottom[loose], kind="stable")]
+            for g in np.split(loose, np.flatnonzero(np.diff(bottom[loose]) > 0.5 * body) + 1):
+                line_of[g] = len(baselines)
+                baselines = np.append(baselines, np.median(bottom[g]))
+
+    # Lines top to bottom, each as an array of character indices
+    by_line = np.argsort(line_of, kind="stable")
+    counts = np.bincount(line_of, minlength=len(baselines))
+    members = np.split(by_line, np.cumsum(counts)[:-1])
+    lines = sorted(zip(baselines, members), key=lambda line: line[0])
+
+    result = []
+    for _, idx in lines:
+        idx = idx[np.argsort(x0[idx], kind="stable")]
+        # Words break where the gap to the previous glyph is wider than kerning
+        gaps = x0[idx[1:]] - x1[idx[:-1]]
+        starts = np.concatenate(([0], np.flatnonzero(gaps > 0.15 * body) + 1, [idx.size]))
+
+        words = []  # (text, is_math)
+        for a, b in zip(starts[:-1], starts[1:]):
+            word = [chars[i] for i in idx[a:b]]
+            kinds = ["math" if MATH_FONT.search(c["fontname"]) else "text" for c in word]
+            scripts = [int(script[i]) for i in idx[a:b]]
+            # Keep sentence punctuation outside the math
+            tail = len(word)
+            while tail > 1 and kinds[tail - 1] == "text" and word[tail - 1]["text"] in TRAILING_PUNCTUATION:
+                tail -= 1
+            letters = [c for c, sc in zip(word[:tail], scripts[:tail]) if not sc]
+            is_math = bool("math" in kinds[:tail] or any(scripts[:tail])
+                           or (len(letters) == 1 and letters[0]["text"].isalpha()
+                               and ITALIC_FONT.search(letters[0]["fontname"])))
+            words.append((_render_word(word[:tail], kinds, scripts), is_math))
+            if tail < len(word):
+                words.append((_render_word(word[tail:], kinds[tail:], scripts[tail:]), None))
+
+        # Adjacent math words share one span; trailing punctuation attaches
+        # to the word before it
+        parts = []
+        span = []
+        for text, is_math in words:
+            if is_math:
+                span.append(text)
+                continue
+            if span:
+                parts.append(r"\( " + " ".join(span) + r" \)")
+                span = []
+            if is_math is None and parts:
+                parts[-1] += text
+            else:
+                parts.append(text)
+        if span:
+            parts.append(r"\( " + " ".join(span) + r" \)")
+
+        text = " ".join(parts).strip()
+        if text:
+            line_size = np.median(size[idx])
+            result.append((text, "heading" if line_size > 1.15 * body else "body"))
+    return result
+
+
+def iter_pdf_pages(pdf_path, images_dir=None, images=None, layout=False, cache=True):
+    """
+    Walk the PDF once, yielding the text of each page.
+    If images_dir is given, the page's images are saved there on the way,
+    named after the PDF (ch3_p2_Im1.png), and (page_num, filename) pairs
+    are appended to images.
+    With layout=True each page is instead given as its layout_lines,
+    built from the page's characters in the same pass.
+    With cache=True the pages come from the extraction cache next to the
+    PDF when it is current, and the images from the image list when it is
+    current and its files are in images_dir. Whatever was not current is
+    extracted and its cache rewritten once the walk completes; a current
+    text cache only costs an image pass.
+    """
+    if cache:
+        cached = read_cache(pdf_path, layout)
+        cached_images = None
+        if images_dir is not None:
+            cached_images = read_images(pdf_path)
+            if cached_images is not None and not all((Path(images_dir) / name).exists()
+                                                     for _, name in cached_images):
+                cached_images = None
+        if cached is not None:
+            if images_dir is not None:
+                if cached_images is None:
+                    cached_images = extract_images_from_pdf(pdf_path, images_dir)
+                    write_images(pdf_path, cached_images)
+                images.extend(cached_images)
+            yield from (page for page in cached if page)
+            return
+
+    # The cache is written as the pages go by, so nothing accumulates
+    writer = None
+    page_images = []
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            if cache:
+                writer = CacheWriter(pdf_path, len(pdf.pages), layout)
+            for page_num, page in enumerate(pdf.pages):
+                text = layout_lines(page.chars) if layout else page.extract_text()
+                if images_dir is not None:
+                    saved = save_page_images(page, page_num, images_dir, Path(pdf_path).stem)
+                    images.extend(saved)
+                    page_images.extend(saved)
+                # Drop the page's parsed objects before moving on
+                page.close()
+                if writer is not None:
+                    writer.add(text)
+                if text:
+                    yield text
+        if writer is not None:
+            writer.commit()
+            writer = None
+            if images_dir is not None:
+                write_images(pdf_path, page_images)
+    except Exception as e:
+        print(f"Error extracting text: {e}")
+    finally:
+        # A walk that failed or was not read to the end leaves the old cache
+        if writer is not None:
+            writer.discard()
+
+
 def extract_images_from_pdf(pdf_path, output_dir):
-    """Extract images from PDF using pypdf and Pillow"""
+    """Extract images from PDF using pdfplumber and Pillow"""
     images = []
     try:
-        reader = pypdf.PdfReader(pdf_path)
-        for page_num, page in enumerate(reader.pages):
-            if '/XObject' in page['/Resources']:
-                x_objects = page['/Resources']['/XObject'].get_object()
-                for obj_name in x_objects:
-                    obj = x_objects[obj_name]
-                    if obj['/Subtype'] == '/Image':
-                        try:
-                            width = obj['/Width']
-                            height = obj['/Height']
-                            data = obj.get_data()
-                            img_filename = f"fig{page_num + 1}_{obj_name[1:]}.png"
-                            img_path = output_dir / img_filename
-
-                            # Determine color space and build PIL image
-                            cs = obj.get('/ColorSpace')
-                            bpc = obj.get('/BitsPerComponent', 8)
-
-                            # Resolve indirect color space references
-                            if isinstance(cs, list) or (hasattr(cs, '__iter__') and not isinstance(cs, str)):
-                                cs_name = str(cs[0]) if cs else '/DeviceGray'
-                            elif hasattr(cs, 'get_object'):
-                                cs = cs.get_object()
-                                cs_name = str(cs[0]) if isinstance(cs, list) else str(cs)
-                            else:
-                                cs_name = str(cs) if cs else '/DeviceGray'
-
-                            if '/Indexed' in cs_name:
-                                # Indexed (palette) color space
-                                palette_obj = cs if isinstance(cs, list) else obj['/ColorSpace'].get_object()
-                                base_cs = str(palette_obj[1]) if hasattr(palette_obj[1], '__str__') else '/DeviceRGB'
-                                max_index = int(palette_obj[2])
-                                palette_data = palette_obj[3]
-                                if hasattr(palette_data, 'get_data'):
-                                    palette_data = palette_data.get_data()
-                                elif hasattr(palette_data, 'get_object'):
-                                    palette_data = palette_data.get_object()
-                                    if hasattr(palette_data, 'get_data'):
-                                        palette_data = palette_data.get_data()
-                                if isinstance(palette_data, str):
-                                    palette_data = palette_data.encode('latin-1')
-
-                                img = Image.frombytes('P', (width, height), data)
-                                # Set palette (RGB)
-                                palette = list(palette_data)
-                                # Pad palette to 256 entries (768 bytes for RGB)
-                                while len(palette) < 768:
-                                    palette.append(0)
-                                img.putpalette(palette[:768])
-                                img = img.convert('RGBA')
-                            elif '/DeviceCMYK' in cs_name:
-                                img = Image.frombytes('CMYK', (width, height), data)
-                                img = img.convert('RGB')
-                            elif '/DeviceRGB' in cs_name:
-                                img = Image.frombytes('RGB', (width, height), data)
-                            else:
-                                # Default: grayscale
-                                if bpc == 1:
-                                    img = Image.frombytes('1', (width, height), data)
-                                else:
-                                    img = Image.frombytes('L', (width, height), data)
-
-                            img.save(img_path, 'PNG')
-                            images.append((page_num, img_filename))
-                        except Exception as e:
-                            print(f"Could not extract image from page {page_num + 1}: {e}")
+        with pdfplumber.open(pdf_path) as pdf:
+            for page_num, page in enumerate(pdf.pages):
+                images.extend(save_page_images(page, page_num, output_dir, Path(pdf_path).stem))
+                page.close()
     except Exception as e:
         print(f"Error extracting images: {e}")
     return images
 
 
+def iter_pdf_text(pdf_path):
+    """Yield the text of each page, one page at a time"""
+    return iter_pdf_pages(pdf_path)
+
+
 def extract_text_from_pdf(pdf_path):
     """Extract text from PDF using pdfplumber"""
-    text_by_page = []
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    text_by_page.append(text)
-    except Exception as e:
-        print(f"Error extracting text: {e}")
-    return text_by_page
+    return list(iter_pdf_text(pdf_path))
+
+
+# Every line is classified by a single match against this pattern; the
+# named group that matched is the line's kind. Order matters: "Example" and
+# "Exercises" would also pass as section headers, and a numbered exercise
+# ("1. Suppose...") must not be taken for a section ("5.2 Cauchy's Theorem").
+# A run-in heading ("5.1. Homotopy. Suppose D is...") starts a section whose
+# first paragraph is the rest of the line.
+LINE_PATTERN = re.compile(r"""
+    (?P<exercises>Exercises?)$
+  | (?P<example>(?:Another\s+)?Examples?)$
+  | (?P<item>(?P<number>\d+)\.\s+(?P<item_text>\S.*))
+  | (?P<run_in>(?P<run_in_number>\d+\.\d+)\.\s+(?P<run_in_title>[^.]+)\.\s*(?P<run_in_text>.*))
+  | (?P<section>\d+\.\d+\s+.*|[A-Z][A-Za-z\s]+$)
+  | (?P<math>(?=[^=^\\]*[=^\\])[A-Za-z0-9+\-=()\[\]{}^*/\\\s]+)$
+""", re.VERBOSE)
+
+# Chinese labels for example headers
+EXAMPLE_LABELS = {"Example": "例子", "Examples": "例子", "Another Example": "另一个例子"}
+
+
+def classify_line(line):
+    """Return (kind, match) for a stripped line; kind is "body" when nothing else matches"""
+    match = LINE_PATTERN.match(line)
+    if match is None:
+        return "body", None
+    return match.lastgroup, match
 
 
 def convert_inline_math(text):
-    """Convert inline math to LaTeX format"""
-    # This is a simple heuristic - may need adjustment based on actual PDF content
-    # Convert standalone equations to display math
-    text = re.sub(r'\n([A-Za-z0-9\+\-\=\(\)\[\]\{\}\^\*\/\\\s]+)\n', r'\n\\[ \\1 \\]\n', text)
-    return text
+    """Wrap standalone equation lines in display math delimiters"""
+    lines = text.split('\n')
+    for i, line in enumerate(lines):
+        if classify_line(line.strip())[0] == "math":
+            lines[i] = f"\\[ {line.strip()} \\]"
+    return '\n'.join(lines)
+
+
+translation_memory = TranslationMemory(BACKENDS["placeholder"]())
+
+# Batching, concurrency and retry settings for translate_paragraphs
+translation_options = {"batch_size": 32, "batch_chars": 4000, "concurrency": 4, "retries": 3, "backoff": 1.0}
+
+# Paragraphs read ahead of the HTML writer and translated together; bounds
+# the text held in memory while keeping several batches in flight
+TRANSLATION_WINDOW = 512
+
+
+def configure_translation(backend="placeholder", memory_path=MEMORY_PATH, url=None, **options):
+    """
+    Select the translation backend and memory file (None: no persistent
+    memory); url is passed to backends that talk to a service, and the
+    remaining options update translation_options.
+    """
+    global translation_memory
+    backend = BACKENDS[backend](url) if url else BACKENDS[backend]()
+    translation_memory = TranslationMemory(backend, memory_path)
+    translation_options.update(options)
+
+
+def translate_paragraphs(paragraphs):
+    """
+    Translate a list of paragraphs at once, as concurrent batches.
+    Returns {paragraph: translation}.
+    """
+    translations = asyncio.run(translation_memory.translate_async(paragraphs, **translation_options))
+    return dict(zip(paragraphs, translations))
+
+
+def iter_translated(events, translations, window=TRANSLATION_WINDOW):
+    """
+    Pass events through in windows of up to `window` paragraphs, filling
+    `translations` with a window's translations before yielding any of its
+    events. The dict only ever holds the current window.
+
+    Windows are translated one after another, so each window boundary
+    waits for its slowest batch; a larger window overlaps more batches at
+    the cost of memory.
+    """
+    buffered = []
+    count = 0
+
+    def flush():
+        translations.clear()
+        translations.update(translate_paragraphs(event_texts(buffered)))
+        yield from buffered
+        buffered.clear()
+
+    for event in events:
+        buffered.append(event)
+        if event[0] in ("para", "item"):
+            count += 1
+            if count >= window:
+                yield from flush()
+                count = 0
+    if buffered:
+        yield from flush()
 
 
 def translate_to_chinese(english_text):
+    """Translate one paragraph through the translation memory"""
+    return translation_memory.translate([english_text])[0]
+
+
+def iter_lines(text_pages):
     """
-    Placeholder for translation. In a real implementation, you would use:
-    - A translation API (Google Translate, DeepL, etc.)
-    - A pre-translated glossary
-    - Manual translation
+    Yield the stripped, non-empty lines of a stream of page texts; pages
+    given as layout_lines are passed through as (text, style) pairs.
+    """
+    for text in text_pages:
+        if isinstance(text, list):
+            yield from text
+            continue
+        for line in text.split('\n'):
+            line = line.strip()
+            if line:
+                yield line
 
-    For now, this returns a placeholder
+
+def iter_section_events(lines):
+    """
+    Turn a line stream into structured events, classifying each line once:
+    ("section", title), ("example", title) and ("exercises", title) open a
+    block; ("para", text), ("math", tex) and, inside an exercises block,
+    ("item", (number, text)) fill it. A header is only emitted once a line
+    of content follows it; an exercise runs on until the next non-body line.
+    Lines may also be (text, style) pairs from layout_lines, whose fonts
+    then decide what is a section header.
     """
-    # This is where you'd integrate actual translation
-    # For demonstration, returning a placeholder
-    return "[中文翻译待添加]"
+    pending_header = None
+    in_exercises = False
+    item = None  # [number, [lines]] of the exercise being collected
+
+    for line in lines:
+        style = None
+        if isinstance(line, tuple):
+            line, style = line
+        kind, match = classify_line(line)
+        if style == "heading" and kind in ("body", "math"):
+            kind = "section"
+        elif style == "body" and kind == "section" and not line[0].isdigit():
+            # A capitalised line in body type is prose, not a header
+            kind = "body"
+        elif style is not None and kind == "math":
+            # Layout lines already carry their math as \( ... \) spans
+            kind = "body"
+
+        if kind == "body" and item is not None:
+            item[1].append(line)
+            continue
+        if item is not None:
+            yield ("item", (item[0], " ".join(item[1])))
+            item = None
+
+        if kind == "run_in":
+            pending_header = ("section", f'{match.group("run_in_number")} {match.group("run_in_title")}')
+            line = match.group("run_in_text")
+            if not line:
+                continue
+            kind = "body"
+        elif kind in ("section", "example", "exercises"):
+            pending_header = (kind, line)
+            continue
+        if pending_header is not None:
+            in_exercises = pending_header[0] == "exercises"
+            yield pending_header
+            pending_header = None
+
+        if kind == "item" and in_exercises:
+            item = [match.group("number"), [match.group("item_text")]]
+        elif kind == "math":
+            yield ("math", line)
+        else:
+            yield ("para", line)
+
+    if item is not None:
+        yield ("item", (item[0], " ".join(item[1])))
+
+
+def event_texts(events):
+    """The texts of a list of events that need a translation, in order"""
+    return [text if kind == "para" else text[1] for kind, text in events if kind in ("para", "item")]
 
 
 def process_chapter_content(text_pages, chapter_num):
@@ -244,24 +624,18 @@ def process_chapter_content(text_pages, chapter_num):
     Process chapter content and structure it for HTML
     This is a simplified version - you'll need to enhance based on actual PDF structure
     """
-    full_text = "\n\n".join(text_pages)
-
-    # Split into sections (this is very basic - adjust based on actual structure)
     sections = []
     current_section = {"title": "", "content": []}
 
-    for line in full_text.split('\n'):
-        line = line.strip()
-        if not line:
-            continue
-
-        # Detect section headers (adjust pattern based on actual PDF)
-        if re.match(r'^\d+\.\d+\s+', line) or re.match(r'^[A-Z][A-Za-z\s]+$', line):
+    for kind, text in iter_section_events(iter_lines(text_pages)):
+        if kind in ("section", "example", "exercises"):
             if current_section["content"]:
                 sections.append(current_section)
-            current_section = {"title": line, "content": []}
+            current_section = {"title": text, "content": []}
+        elif kind == "item":
+            current_section["content"].append(f"{text[0]}. {text[1]}")
         else:
-            current_section["content"].append(line)
+            current_section["content"].append(text)
 
     if current_section["content"]:
         sections.append(current_section)
@@ -269,96 +643,336 @@ def process_chapter_content(text_pages, chapter_num):
     return sections
 
 
+def iter_html_chunks(chapter_num, chapter_title, events, translations=None, chinese_title=None):
+    """
+    Yield the HTML body for a chapter, one chunk per section event.
+    chapter_num is None for documents that are not numbered chapters;
+    chinese_title heads the Chinese half (default: chapter_title).
+    translations maps paragraphs and exercise texts to their translation;
+    without it they are all translated before the first section is written.
+    """
+    chinese_title = chinese_title or chapter_title
+    if chapter_num is None:
+        content = f'        <h1>{chapter_title}</h1>\n\n'
+        content += '        <blockquote>\n'
+        content += f'            <h1 style="text-align: center; font-size: 2.2em;">{chinese_title}</h1>\n'
+        content += '        </blockquote>\n\n'
+    else:
+        content = f'        <h1>Chapter {chapter_num}<br>{chapter_title}</h1>\n\n'
+        content += '        <blockquote>\n'
+        content += ('            <h1 style="text-align: center; font-size: 2.2em;">'
+                    f'第{CHINESE_NUMERALS.get(chapter_num, chapter_num)}章<br>{chinese_title}</h1>\n')
+        content += '        </blockquote>\n\n'
+    yield content
+
+    if translations is None:
+        # One translation memory lookup (and at most one backend call)
+        events = list(events)
+        texts = event_texts(events)
+        translations = dict(zip(texts, translation_memory.translate(texts)))
+
+    block = None  # the open example or exercises <div>
+    indent = ''
+    for kind, text in events:
+        if kind in ("section", "example", "exercises") and block is not None:
+            yield '        </div>\n\n'
+            block = None
+            indent = ''
+
+        if kind == "section":
+            yield f'        <h2>{text}</h2>\n\n'
+        elif kind == "example":
+            block = kind
+            indent = '    '
+            chunk = '        <div class="example">\n'
+            chunk += f'            <div class="example-title">{text}</div>\n'
+            chunk += '            <blockquote>\n'
+            chunk += f'                <div class="example-title">{EXAMPLE_LABELS.get(text, "例子")}</div>\n'
+            chunk += '            </blockquote>\n\n'
+            yield chunk
+        elif kind == "exercises":
+            block = kind
+            yield f'        <div class="exercises">\n            <h3>{text}</h3>\n\n'
+        elif kind == "item":
+            number, item_text = text
+            chunk = '            <div class="exercise-item">\n'
+            chunk += f'                <strong>{number}.</strong> {item_text}\n'
+            chunk += '            </div>\n\n'
+            chunk += '            <blockquote>\n'
+            chunk += f'                <strong>{number}.</strong> {translations[item_text]}\n'
+            chunk += '            </blockquote>\n\n'
+            yield chunk
+        elif kind == "math":
+            yield f'{indent}        <p>\\[ {text} \\]</p>\n\n'
+        else:
+            # Paragraph followed by its Chinese translation
+            chunk = f'{indent}        <p>{text}</p>\n\n'
+            chunk += f'{indent}        <blockquote>\n'
+            chunk += f'{indent}            <p>{translations[text]}</p>\n'
+            chunk += f'{indent}        </blockquote>\n\n'
+            yield chunk
+
+    if block is not None:
+        yield '        </div>\n\n'
+
+
 def generate_html_content(chapter_num, chapter_title, sections, images_dir="images"):
     """Generate HTML content with bilingual text"""
-    content = f'        <h1>Chapter {chapter_num}<br>{chapter_title}</h1>\n\n'
-    content += '        <blockquote>\n'
-    content += f'            <h1 style="text-align: center; font-size: 2.2em;">第{chapter_num}章<br>{chapter_title}</h1>\n'
-    content += '        </blockquote>\n\n'
-
+    events = []
     for section in sections:
         if section["title"]:
-            content += f'        <h2>{section["title"]}</h2>\n\n'
-
-        for para in section["content"]:
-            # Convert to paragraph
-            content += f'        <p>{para}</p>\n\n'
-            # Add Chinese translation
-            content += '        <blockquote>\n'
-            content += f'            <p>{translate_to_chinese(para)}</p>\n'
-            content += '        </blockquote>\n\n'
-
-    return content
+            events.append(("section", section["title"]))
+        events.extend(("para", para) for para in section["content"])
+    return ''.join(iter_html_chunks(chapter_num, chapter_title, events))
+
+
+def write_html(output_html_path, title, chunks):
+    """Write the page template around a stream of body chunks"""
+    head, tail = HTML_TEMPLATE.split('{content}')
+    head = head.format(title=title, stylesheet=stylesheet_link(output_html_path))
+    manifest = load_manifest()
+    if manifest is not None:
+        # Vendored assets: the pages only ever contain TeX
+        head = self_host(head, output_html_path, manifest, component="tex-chtml")
+    with open(output_html_path, 'w', encoding='utf-8') as f:
+        f.write(head)
+        for chunk in chunks:
+            f.write(chunk)
+        f.write(tail.format())
 
 
-def convert_pdf_to_html(pdf_path, output_html_path, chapter_num, chapter_title):
-    """Main conversion function"""
+def convert_pdf_to_html(pdf_path, output_html_path, chapter_num, chapter_title, layout=False, cache=True):
+    """
+    Main conversion function; layout=True reads the text with layout_lines,
+    cache=False ignores the extraction cache and always reads the PDF
+    """
     print(f"Converting {pdf_path} to {output_html_path}...")
 
     # Create images directory
     images_dir = Path(output_html_path).parent / "images"
     images_dir.mkdir(exist_ok=True)
 
-    # Extract text
-    print("Extracting text...")
-    text_pages = extract_text_from_pdf(pdf_path)
-
-    # Extract images
-    print("Extracting images...")
-    images = extract_images_from_pdf(pdf_path, images_dir)
+    # One pass over the PDF: stream pages -> lines -> section events,
+    # saving each page's images as it goes by. Events are translated a
+    # window at a time, in concurrent batches, and written in document
+    # order, so only one window of text is held in memory
+    print("Extracting, translating and generating HTML...")
+    images = []
+    translations = {}
+    events = iter_section_events(iter_lines(iter_pdf_pages(pdf_path, images_dir, images, layout, cache)))
+    chinese_title = DOCUMENTS.get(Path(pdf_path).stem, (None, None, None))[2]
+    write_html(
+        output_html_path,
+        chapter_title if chapter_num is None else f"Chapter {chapter_num}: {chapter_title}",
+        iter_html_chunks(chapter_num, chapter_title, iter_translated(events, translations), translations,
+                         chinese_title)
+    )
     print(f"Extracted {len(images)} images")
+    print(f"Translations: {translation_memory.stats()}")
 
-    # Process content
-    print("Processing content...")
-    sections = process_chapter_content(text_pages, chapter_num)
+    print(f"✓ Conversion complete: {output_html_path}")
+    return True
 
-    # Generate HTML
-    print("Generating HTML...")
-    html_content = generate_html_content(chapter_num, chapter_title, sections)
 
-    # Create full HTML
-    full_html = HTML_TEMPLATE.format(
-        title=f"Chapter {chapter_num}: {chapter_title}",
-        content=html_content
-    )
+def _convert_worker(conn, translation, layout, cache, pdf_path, html_path, chapter_num, chapter_title):
+    """Process entry point: convert one document and report back over conn"""
+    try:
+        configure_translation(**translation)
+        convert_pdf_to_html(pdf_path, html_path, chapter_num, chapter_title, layout, cache)
+        conn.send(("ok", ""))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
 
-    # Write to file
-    with open(output_html_path, 'w', encoding='utf-8') as f:
-        f.write(full_html)
 
-    print(f"✓ Conversion complete: {output_html_path}")
-    return True
+def convert_all(tasks, jobs, timeout, translation=None, layout=False, cache=True):
+    """
+    Convert each (pdf_path, html_path, chapter_num, chapter_title) task in
+    its own process, at most `jobs` at a time. A conversion that runs longer
+    than `timeout` seconds is killed; a crash or timeout only affects its own
+    document. translation holds the keyword arguments passed to
+    configure_translation in each worker, layout selects layout-aware
+    extraction and cache=False bypasses the extraction cache. Returns {pdf_path: (status, seconds, detail)}.
+    """
+    pending = list(tasks)
+    running = {}  # process sentinel -> (process, connection, task, start time)
+    results = {}
+
+    while pending or running:
+        while pending and len(running) < jobs:
+            task = pending.pop(0)
+            parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+            proc = multiprocessing.Process(target=_convert_worker, args=(child_conn, translation or {}, layout, cache) + tuple(task))
+            proc.start()
+            child_conn.close()
+            running[proc.sentinel] = (proc, parent_conn, task, time.monotonic())
+
+        next_deadline = min(start + timeout for _, _, _, start in running.values())
+        finished = multiprocessing.connection.wait(list(running), max(0, next_deadline - time.monotonic()))
+
+        for sentinel in finished:
+            proc, conn, task, start = running.pop(sentinel)
+            proc.join()
+            if conn.poll():
+                status, detail = conn.recv()
+            else:
+                status, detail = "error", f"worker exited with code {proc.exitcode}"
+            results[task[0]] = (status, time.monotonic() - start, detail)
+
+        now = time.monotonic()
+        for sentinel, (proc, conn, task, start) in list(running.items()):
+            if now - start > timeout:
+                proc.kill()
+                proc.join()
+                del running[sentinel]
+                results[task[0]] = ("timeout", now - start, f"killed after {timeout}s")
+
+    return results
+
+
+def print_summary(tasks, results):
+    """Print one line per document and the totals"""
+    print("\n" + "=" * 60)
+    print(f"{'Document':<18}{'Status':<10}{'Time':>8}  Detail")
+    print("-" * 60)
+    for task in tasks:
+        status, seconds, detail = results[task[0]]
+        print(f"{Path(task[0]).name:<18}{status:<10}{seconds:>7.1f}s  {detail}")
+    ok = sum(1 for status, _, _ in results.values() if status == "ok")
+    print("-" * 60)
+    print(f"{ok}/{len(tasks)} converted, {len(tasks) - ok} failed")
+
+
+def write_index(html_dir):
+    """Regenerate index.html from the documents present in html_dir"""
+    items = []
+    for stem, (chapter_num, title, chinese) in DOCUMENTS.items():
+        if not (html_dir / f"{stem}.html").exists():
+            continue
+        if chapter_num is None:
+            label, chinese_label = title, chinese
+        else:
+            label = f"Chapter {chapter_num}: {title}"
+            chinese_label = f"第{CHINESE_NUMERALS[chapter_num]}章：{chinese}"
+        items.append(
+            f'<li>\n<a href="{stem}.html">{label}</a>\n'
+            f'<span class="chinese">{chinese_label}</span>\n</li>\n'
+        )
 
+    images_dir = html_dir / "images"
+    image_count = len(list(images_dir.glob("*.png"))) if images_dir.exists() else 0
+    today = date.today()
+    html = INDEX_TEMPLATE.format(
+        stylesheet=stylesheet_link(html_dir / "index.html"),
+        chapter_count=len(items),
+        image_count=image_count,
+        toc="\n".join(items),
+        month=today.strftime("%B %Y"),
+        month_cn=f"{today.year}年{today.month}月",
+    )
+    with open(html_dir / "index.html", 'w', encoding='utf-8') as f:
+        f.write(html)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the course PDFs in cf/ to bilingual HTML")
+    parser.add_argument("documents", nargs="*",
+                        help="PDF names to convert, e.g. ch3 ch4 (default: every PDF in cf/ without a page yet)")
+    parser.add_argument("--force", action="store_true",
+                        help="with no documents named, also convert those whose page already exists")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count(),
+                        help="number of documents converted at once")
+    parser.add_argument("--timeout", type=float, default=600,
+                        help="seconds before a single conversion is killed")
+    parser.add_argument("--no-index", action="store_true",
+                        help="do not regenerate html/index.html")
+    parser.add_argument("--index-only", action="store_true",
+                        help="only regenerate html/index.html from the pages already converted")
+    parser.add_argument("--layout", action="store_true",
+                        help="extract text from character positions and fonts: headings by size, math from math fonts")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="re-extract every PDF instead of reading *_extracted.txt / *_layout.txt")
+    parser.add_argument("--prerender-math", action="store_true",
+                        help="typeset the TeX of the converted pages to SVG now instead of in the browser")
+    parser.add_argument("--translator", choices=sorted(BACKENDS), default="placeholder",
+                        help="translation backend")
+    parser.add_argument("--translation-memory", default=MEMORY_PATH,
+                        help="translation memory file shared by all runs")
+    parser.add_argument("--no-translation-memory", action="store_true",
+                        help="do not read or write the translation memory file")
+    parser.add_argument("--translator-url",
+                        help="service URL for the http translator (default: $TRANSLATOR_URL)")
+    parser.add_argument("--translation-batch", type=int, default=translation_options["batch_size"],
+                        help="paragraphs per translation request")
+    parser.add_argument("--translation-concurrency", type=int, default=translation_options["concurrency"],
+                        help="translation requests in flight per document")
+    parser.add_argument("--translation-retries", type=int, default=translation_options["retries"],
+                        help="retries for a failed translation request, with exponential backoff")
+    args = parser.parse_args()
+
+    base_dir = Path(__file__).resolve().parent
+    html_dir = base_dir / "html"
+    html_dir.mkdir(exist_ok=True)
+    (html_dir / "images").mkdir(exist_ok=True)
 
-if __name__ == "__main__":
-    # Configuration for chapters
-    chapters = {
-        3: "Chapter Title 3",  # Update with actual titles
-        4: "Chapter Title 4",
-        5: "Chapter Title 5",
-        6: "Chapter Title 6",
-        7: "Chapter Title 7",
-        8: "Chapter Title 8",
-        9: "Chapter Title 9",
-        10: "Chapter Title 10",
-        11: "Chapter Title 11",
+    if args.index_only:
+        write_index(html_dir)
+        print(f"✓ Index regenerated: {html_dir / 'index.html'}")
+        return 0
+
+    stems = args.documents or sorted(
+        (p.stem for p in base_dir.glob("*.pdf")),
+        key=lambda stem: list(DOCUMENTS).index(stem) if stem in DOCUMENTS else len(DOCUMENTS)
+    )
+    tasks = []
+    existing = []
+    for stem in stems:
+        pdf_file = base_dir / f"{Path(stem).stem}.pdf"
+        if not pdf_file.exists():
+            print(f"PDF file not found: {pdf_file}")
+            continue
+        html_file = html_dir / f"{pdf_file.stem}.html"
+        # The pages in html/ carry hand-written translations; only replace
+        # them when asked to
+        if not args.documents and not args.force and html_file.exists():
+            existing.append(pdf_file.stem)
+            continue
+        chapter_num, title, _ = DOCUMENTS.get(pdf_file.stem, (None, pdf_file.stem, ""))
+        tasks.append((pdf_file, html_file, chapter_num, title))
+    if existing:
+        print(f"Skipping {len(existing)} document(s) whose page exists: {', '.join(existing)} "
+              "(name them or pass --force to overwrite)")
+    if not tasks:
+        print("Nothing to convert")
+        return 0
+
+    translation = {
+        "backend": args.translator,
+        "memory_path": None if args.no_translation_memory else args.translation_memory,
+        "url": args.translator_url,
+        "batch_size": args.translation_batch,
+        "concurrency": args.translation_concurrency,
+        "retries": args.translation_retries,
     }
+    results = convert_all(tasks, max(1, args.jobs), args.timeout, translation, args.layout, not args.no_cache)
+    print_summary(tasks, results)
 
-    base_dir = Path("/Users/shishengli/pairings-for-beginners/cf")
-    html_dir = base_dir / "html"
-    html_dir.mkdir(exist_ok=True)
+    if args.prerender_math:
+        renderer = MathRenderer()
+        try:
+            prerender_files([task[1] for task in tasks if results[task[0]][0] == "ok"], renderer)
+            print(f"✓ Math pre-rendered: {renderer.stats()}")
+        except MathRenderError as e:
+            print(f"✗ Math pre-rendering failed: {e}")
+            return 1
 
-    # Process ch3.pdf first
-    chapter_num = 3
-    pdf_file = base_dir / f"ch{chapter_num}.pdf"
-    html_file = html_dir / f"ch{chapter_num}.html"
-
-    if pdf_file.exists():
-        convert_pdf_to_html(
-            pdf_file,
-            html_file,
-            chapter_num,
-            chapters.get(chapter_num, f"Chapter {chapter_num}")
-        )
-    else:
-        print(f"PDF file not found: {pdf_file}")
+    if not args.no_index:
+        write_index(html_dir)
+        print(f"✓ Index regenerated: {html_dir / 'index.html'}")
+
+    return 0 if all(status == "ok" for status, _, _ in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
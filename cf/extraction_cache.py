@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Extraction cache for the course PDFs
+
+The text pdfplumber extracts from <stem>.pdf is kept next to it, in
+<stem>_extracted.txt (or <stem>_layout.txt for layout-aware extraction),
+so that later runs and the other conversion scripts can skip the PDF pass.
+The images the HTML converter saves on the way are listed separately, in
+<stem>_images.txt, so the text cache is the same whichever tool wrote it
+and a text-only run never invalidates the image list, or the other way
+round.
+
+A cache file starts with a header of "# key: value" lines:
+
+    # cf extraction cache
+    # format: 1
+    # mode: text
+    # source: ch9.pdf
+    # sha256: <digest of the PDF>
+    # pages: 8
+
+followed by one block per page, as in the original dumps:
+
+    ================================================================================
+    PAGE 1
+    ================================================================================
+
+    <page text>
+
+In layout mode each line of a page is "<style>\t<text>". The image list
+is the same header with mode "images" and one more line, and no body:
+
+    # images: 0:ch9_p1_Im1.png 2:ch9_p3_Im2.png
+
+A cache is only used when its format, mode and PDF digest match; anything
+else, including dumps without a header, counts as stale and is rewritten
+on the next extraction.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+CACHE_FORMAT = 1
+MAGIC = "# cf extraction cache"
+SEPARATOR = "=" * 80
+
+
+def cache_path(pdf_path, layout=False):
+    pdf_path = Path(pdf_path)
+    return pdf_path.with_name(f"{pdf_path.stem}_{'layout' if layout else 'extracted'}.txt")
+
+
+def images_path(pdf_path):
+    pdf_path = Path(pdf_path)
+    return pdf_path.with_name(f"{pdf_path.stem}_images.txt")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _parse(text, layout):
+    """Split the body of a cache file into pages"""
+    blocks = text.split(f"\n\n{SEPARATOR}\nPAGE ")[1:]
+    pages = []
+    for block in blocks:
+        page = block.split(f"\n{SEPARATOR}\n\n", 1)[1]
+        if layout:
+            page = [tuple(line.split("\t", 1)[::-1]) for line in page.split("\n") if line]
+        pages.append(page)
+    return pages
+
+
+def read_header(path):
+    """The header fields of a cache file, or None if it has no header"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.readline().rstrip("\n") != MAGIC:
+                return None
+            header = {}
+            for line in f:
+                if not line.startswith("# "):
+                    break
+                key, _, value = line[2:].rstrip("\n").partition(": ")
+                header[key] = value
+            return header
+    except OSError:
+        return None
+
+
+def _current_header(path, pdf_path, mode):
+    """The header of the cache file at path if it is current for pdf_path in mode, else None"""
+    header = read_header(path)
+    if (header is None or header.get("format") != str(CACHE_FORMAT)
+            or header.get("mode") != mode
+            or header.get("sha256") != file_sha256(pdf_path)):
+        return None
+    return header
+
+
+def _header_lines(pdf_path, mode):
+    return [
+        MAGIC,
+        f"# format: {CACHE_FORMAT}",
+        f"# mode: {mode}",
+        f"# source: {pdf_path.name}",
+        f"# sha256: {file_sha256(pdf_path)}",
+    ]
+
+
+def _replace(path, text):
+    # Write beside the target and rename, so readers never see half a file
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def read_cache(pdf_path, layout=False):
+    """
+    Return the pages cached for pdf_path (text, or [(text, style)] in
+    layout mode), or None when there is no current cache
+    """
+    path = cache_path(pdf_path, layout)
+    header = _current_header(path, pdf_path, "layout" if layout else "text")
+    if header is None:
+        return None
+
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    pages = _parse(text, layout)
+    if len(pages) != int(header.get("pages", -1)):
+        return None
+    return pages
+
+
+def read_images(pdf_path):
+    """Return the (page_num, filename) pairs listed for pdf_path, or None when the list is not current"""
+    header = _current_header(images_path(pdf_path), pdf_path, "images")
+    if header is None or "images" not in header:
+        return None
+    images = []
+    for item in header["images"].split():
+        page_num, _, name = item.partition(":")
+        images.append((int(page_num), name))
+    return images
+
+
+def write_images(pdf_path, images):
+    """Record the (page_num, filename) pairs of the images saved from pdf_path"""
+    pdf_path = Path(pdf_path)
+    path = images_path(pdf_path)
+    lines = _header_lines(pdf_path, "images")
+    lines.append("# images: " + " ".join(f"{page_num}:{name}" for page_num, name in images))
+    _replace(path, "\n".join(lines) + "\n")
+    return path
+
+
+class CacheWriter:
+    """
+    Write the cache for pdf_path a page at a time, as the PDF is read, so
+    no more than one page is held for it. The file replaces the previous
+    cache on commit(), once every page is in; discard() drops it.
+    """
+
+    def __init__(self, pdf_path, page_count, layout=False):
+        pdf_path = Path(pdf_path)
+        self.path = cache_path(pdf_path, layout)
+        self.layout = layout
+        self.page_count = page_count
+        self.pages = 0
+        # Written beside the target and renamed, so readers never see half a file
+        self.tmp_path = self.path.with_name(self.path.name + ".tmp")
+        self.file = open(self.tmp_path, "w", encoding="utf-8")
+        lines = _header_lines(pdf_path, "layout" if layout else "text")
+        lines.append(f"# pages: {page_count}")
+        self.file.write("\n".join(lines))
+
+    def add(self, page):
+        if self.layout:
+            page = "\n".join(f"{style}\t{text}" for text, style in page)
+        self.pages += 1
+        self.file.write(f"\n\n{SEPARATOR}\nPAGE {self.pages}\n{SEPARATOR}\n\n{page or ''}")
+
+    def commit(self):
+        self.file.close()
+        if self.pages != self.page_count:
+            self.discard()
+            raise ValueError(f"{self.path.name}: {self.pages} of {self.page_count} pages written")
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def discard(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+def write_cache(pdf_path, pages, layout=False):
+    """Write the cache for pdf_path: pages holds every page of the PDF in order"""
+    writer = CacheWriter(pdf_path, len(pages), layout)
+    for page in pages:
+        writer.add(page)
+    return writer.commit()
@@ -0,0 +1,47 @@
+#!/usr/bin/env node
+/*
+ * Offline TeX -> SVG renderer for prerender_math.py
+ *
+ * Reads {"formulas": [{"tex": "...", "display": true}, ...]} as JSON on
+ * stdin and writes {"version": "<MathJax version>", "results": ["<mjx-container ...>", ...]}
+ * to stdout, one result per formula in order. TeX errors are rendered as
+ * MathJax error boxes, as in the browser.
+ *
+ * Needs mathjax-full 3 where node can find it:
+ *     npm install --prefix cf mathjax-full@3
+ */
+
+function load(name) {
+    try {
+        return require(`mathjax-full/js/${name}.js`);
+    } catch (e) {
+        console.error(`Cannot load mathjax-full (${e.code}); install it with: npm install --prefix cf mathjax-full@3`);
+        process.exit(2);
+    }
+}
+
+const {mathjax} = load('mathjax');
+const {TeX} = load('input/tex');
+const {SVG} = load('output/svg');
+const {liteAdaptor} = load('adaptors/liteAdaptor');
+const {RegisterHTMLHandler} = load('handlers/html');
+const {AllPackages} = load('input/tex/AllPackages');
+
+const adaptor = liteAdaptor();
+RegisterHTMLHandler(adaptor);
+
+// fontCache: 'none' makes every SVG self-contained, so each one can be
+// cached and reused on any page
+const doc = mathjax.document('', {
+    InputJax: new TeX({packages: AllPackages.filter((name) => name !== 'bussproofs')}),
+    OutputJax: new SVG({fontCache: 'none'}),
+});
+
+let input = '';
+process.stdin.setEncoding('utf8');
+process.stdin.on('data', (chunk) => { input += chunk; });
+process.stdin.on('end', () => {
+    const {formulas} = JSON.parse(input);
+    const results = formulas.map(({tex, display}) => adaptor.outerHTML(doc.convert(tex, {display})));
+    process.stdout.write(JSON.stringify({version: mathjax.version, results}));
+});
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Pre-render the TeX in generated HTML pages to static SVG
+
+Every formula between MathJax delimiters is rendered once, offline, by
+mathjax_render.js (MathJax 3 under node), and replaced in the page by the
+<mjx-container> MathJax itself would have produced in the browser. Pages
+whose formulas were all rendered no longer load MathJax (or the polyfill
+it needed) at all.
+
+The delimiters are the page's own, read from its inline `MathJax = {...}`
+configuration, or MathJax's defaults: \\( \\) inline, $$ $$ and \\[ \\]
+displayed, plus \\begin{...}\\end{...} environments. Formulas split
+across several HTML elements are left as they are, and such a page keeps
+its MathJax scripts.
+
+Rendered formulas are cached in a SQLite file keyed by the TeX source,
+display mode, renderer command and MathJax version, so a formula that appears on many pages, or in many runs, is
+rendered once. Automatic equation numbering (tags: 'ams') is per page in
+MathJax and is not reproduced; explicit \\tag{...} is.
+
+    python prerender_math.py html/ ../ff/ff.html
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+from bs4 import BeautifulSoup, NavigableString
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE_PATH = os.path.join(HERE, "math_cache.db")
+RENDERER = ["node", os.path.join(HERE, "mathjax_render.js")]
+
+# Bump when the renderer's output options change, to re-render everything
+RENDER_VERSION = 1
+
+# MathJax 3 defaults
+DEFAULT_CONFIG = {
+    "inlineMath": [["\\(", "\\)"]],
+    "displayMath": [["$$", "$$"], ["\\[", "\\]"]],
+    "processEscapes": True,
+    "processEnvironments": True,
+}
+
+# Elements MathJax does not look into
+SKIP_TAGS = {"script", "noscript", "style", "textarea", "pre", "code", "annotation", "annotation-xml",
+             "mjx-container", "svg"}
+SKIP_CLASSES = {"tex2jax_ignore", "mathjax_ignore"}
+
+# What MathJax adds to the page for SVG output with fontCache: 'none'
+SVG_STYLES = """
+mjx-container[jax="SVG"] { direction: ltr; }
+mjx-container[jax="SVG"] > svg { overflow: visible; min-height: 1px; min-width: 1px; }
+mjx-container[jax="SVG"][display="true"] { display: block; text-align: center; margin: 1em 0; }
+mjx-container[jax="SVG"][justify="left"] { text-align: left; }
+mjx-container[jax="SVG"][justify="right"] { text-align: right; }
+g[data-mml-node="merror"] > g { fill: red; stroke: red; }
+g[data-mml-node="merror"] > rect[data-background] { fill: yellow; stroke: none; }
+"""
+
+# Stand-ins for formulas while the page is serialized (private use characters)
+MARKER = re.compile("\ue000(\\d+)\ue001")
+
+CLIENT_SCRIPT = re.compile(r"mathjax|polyfill\.io", re.IGNORECASE)
+CONFIG_SCRIPT = re.compile(r"(?:window\.)?MathJax\s*=\s*\{")
+
+
+class MathRenderError(Exception):
+    """The renderer could not be run, or did not answer properly"""
+
+
+def formula_key(tex, display, renderer):
+    return hashlib.sha256(f"{RENDER_VERSION}\0{renderer}\0{int(display)}\0{tex}".encode("utf-8")).hexdigest()
+
+
+class MathRenderer:
+    """
+    Render (tex, display) formulas through the renderer command, with a
+    dictionary for this run and the SQLite file at `path` (None: no
+    persistent cache) in front of it.
+    """
+
+    def __init__(self, command=None, path=CACHE_PATH):
+        self.command = command or RENDERER
+        self.path = path
+        self.cache = {}
+        self._conn = None
+        self._identity = None
+        self.hits = 0
+        self.misses = 0
+
+    def _db(self):
+        if self.path is None:
+            return None
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS formulas (key TEXT PRIMARY KEY, tex TEXT NOT NULL, "
+                "display INTEGER NOT NULL, renderer TEXT NOT NULL, html TEXT NOT NULL) WITHOUT ROWID"
+            )
+        return self._conn
+
+    def identity(self):
+        """
+        The renderer command and the MathJax version it runs, which the
+        output depends on; asked of the renderer once, with no formulas
+        """
+        if self._identity is None:
+            version, _ = self._run([])
+            self._identity = f"{' '.join(self.command)} mathjax {version}"
+        return self._identity
+
+    def _lookup(self, keys):
+        found = {key: self.cache[key] for key in keys if key in self.cache}
+        db = self._db()
+        lookup = list({key for key in keys if key not in found})
+        if db is not None:
+            for i in range(0, len(lookup), 500):
+                chunk = lookup[i:i + 500]
+                rows = db.execute(f"SELECT key, html FROM formulas WHERE renderer = ? "
+                                  f"AND key IN ({','.join('?' * len(chunk))})", [self.identity()] + chunk)
+                for key, html in rows:
+                    found[key] = self.cache[key] = html
+        return found
+
+    def _run(self, formulas):
+        """Render a list of (tex, display) in one renderer process; returns (version, [html])"""
+        request = json.dumps({"formulas": [{"tex": tex, "display": display} for tex, display in formulas]})
+        try:
+            result = subprocess.run(self.command, input=request, capture_output=True, text=True, encoding="utf-8")
+        except OSError as e:
+            raise MathRenderError(f"cannot run {' '.join(self.command)}: {e}")
+        if result.returncode != 0:
+            raise MathRenderError(f"{' '.join(self.command)} exited with {result.returncode}: "
+                                  f"{result.stderr.strip()[-500:]}")
+        try:
+            answer = json.loads(result.stdout)
+            version, results = answer["version"], answer["results"]
+        except (ValueError, KeyError) as e:
+            raise MathRenderError(f"unexpected renderer output: {e}")
+        if len(results) != len(formulas):
+            raise MathRenderError(f"expected {len(formulas)} results, got {len(results)}")
+        return version, results
+
+    def render(self, formulas):
+        """Render a list of (tex, display), running the renderer once for all misses"""
+        if not formulas:
+            return []
+        renderer = self.identity()
+        keys = [formula_key(tex, display, renderer) for tex, display in formulas]
+        found = self._lookup(keys)
+        missing = {}
+        for key, formula in zip(keys, formulas):
+            if key not in found:
+                missing[key] = formula
+
+        if missing:
+            _, results = self._run(list(missing.values()))
+            for key, html in zip(missing, results):
+                found[key] = self.cache[key] = html
+            db = self._db()
+            if db is not None:
+                with db:
+                    db.executemany(
+                        "INSERT OR REPLACE INTO formulas VALUES (?, ?, ?, ?, ?)",
+                        [(key, tex, int(display), renderer, found[key])
+                         for key, (tex, display) in missing.items()],
+                    )
+
+        self.misses += len(missing)
+        self.hits += len(formulas) - len(missing)
+        return [found[key] for key in keys]
+
+    def stats(self):
+        return f"{self.hits} formula(s) from the cache, {self.misses} rendered"
+
+
+def page_config(soup):
+    """The page's tex delimiter settings: its inline MathJax configuration over the defaults"""
+    config = dict(DEFAULT_CONFIG)
+    for script in soup.find_all("script", src=False):
+        source = script.string or ""
+        if not CONFIG_SCRIPT.search(source):
+            continue
+        for name in ("inlineMath", "displayMath"):
+            match = re.search(rf"{name}\s*:\s*(\[\s*\[.*?\]\s*\])", source, re.DOTALL)
+            if match:
+                # JavaScript string literals in single quotes -> JSON
+                config[name] = json.loads(match.group(1).replace("'", '"'))
+        for name in ("processEscapes", "processEnvironments"):
+            match = re.search(rf"{name}\s*:\s*(true|false)", source)
+            if match:
+                config[name] = match.group(1) == "true"
+    return config
+
+
+def delimiter_pattern(config):
+    """One pattern for every opening delimiter, longest first, plus \\$ and \\begin{...}"""
+    openers = [(open_, close, False) for open_, close in config["inlineMath"]]
+    openers += [(open_, close, True) for open_, close in config["displayMath"]]
+    openers.sort(key=lambda opener: -len(opener[0]))
+    alternatives = [re.escape(open_) for open_, _, _ in openers]
+    if config["processEscapes"]:
+        alternatives.insert(0, r"(?P<escape>\\\$)")
+    if config["processEnvironments"]:
+        alternatives.append(r"\\begin\{(?P<env>[^}]+)\}")
+    closers = {open_: (close, display) for open_, close, display in reversed(openers)}
+    return re.compile("|".join(alternatives)), closers
+
+
+def split_math(text, pattern, closers):
+    """
+    Split a text node into strings and (tex, display) formulas. Returns
+    (pieces, unmatched), unmatched counting the opening delimiters that
+    have no closing one in this text. Escaped dollars are left as they
+    are, for unescape_dollars or client-side MathJax.
+    """
+    pieces = []
+    unmatched = 0
+    start = pos = 0
+    while True:
+        match = pattern.search(text, pos)
+        if match is None:
+            break
+        if match.lastgroup == "escape":
+            pos = match.end()
+            continue
+        if match.lastgroup == "env":
+            closing = f"\\end{{{match.group('env')}}}"
+            end = text.find(closing, match.end())
+            tex, display, after = text[match.start():end + len(closing)], True, end + len(closing)
+        else:
+            closing, display = closers[match.group(0)]
+            end = text.find(closing, match.end())
+            tex, after = text[match.end():end], end + len(closing)
+        if end == -1:
+            unmatched += 1
+            pos = match.end()
+            continue
+        if not tex.strip():
+            pos = after
+            continue
+        pieces.append(text[start:match.start()])
+        pieces.append((tex.strip(), display))
+        start = pos = after
+    pieces.append(text[start:])
+    return pieces, unmatched
+
+
+def iter_math_text(node):
+    """Text nodes MathJax would typeset, skipping the elements it ignores"""
+    for child in node.children:
+        if isinstance(child, NavigableString):
+            if type(child) is NavigableString:
+                yield child
+        elif child.name not in SKIP_TAGS and not SKIP_CLASSES.intersection(child.get("class") or ()):
+            yield from iter_math_text(child)
+
+
+def mark_formulas(soup):
+    """
+    Replace every formula in the page with a marker; returns the list of
+    (tex, display) the markers index and the number of unmatched delimiters.
+    """
+    pattern, closers = delimiter_pattern(page_config(soup))
+    formulas = []
+    unmatched = 0
+    for node in list(iter_math_text(soup)):
+        pieces, missed = split_math(str(node), pattern, closers)
+        unmatched += missed
+        if len(pieces) == 1 and pieces[0] == str(node):
+            continue
+        text = ""
+        for piece in pieces:
+            if isinstance(piece, tuple):
+                text += f"\ue000{len(formulas)}\ue001"
+                formulas.append(piece)
+            else:
+                text += piece
+        node.replace_with(NavigableString(text))
+    return formulas, unmatched
+
+
+def unescape_dollars(soup):
+    """Turn \\$ into $ in the text MathJax would have typeset, as it would have"""
+    if not page_config(soup)["processEscapes"]:
+        return
+    for node in list(iter_math_text(soup)):
+        if "\\$" in node:
+            node.replace_with(NavigableString(str(node).replace("\\$", "$")))
+
+
+def drop_client_math(soup):
+    """Remove the MathJax scripts and configuration; add the SVG styles"""
+    for script in soup.find_all("script"):
+        if CLIENT_SCRIPT.search(script.get("src", "")) or (
+                not script.get("src") and CONFIG_SCRIPT.search(script.string or "")):
+            script.decompose()
+    if soup.head is not None and soup.find("style", id="MJX-SVG-styles") is None:
+        style = soup.new_tag("style", id="MJX-SVG-styles")
+        style.string = SVG_STYLES
+        soup.head.append(style)
+
+
+def prerender_files(paths, renderer):
+    """
+    Pre-render the formulas of every page in paths, in place, with one
+    renderer call for all of them. Returns [(path, formulas, unmatched)].
+    """
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            original = f.read()
+        soup = BeautifulSoup(original, "html.parser")
+        formulas, unmatched = mark_formulas(soup)
+        pages.append((path, original, soup, formulas, unmatched))
+
+    rendered = renderer.render([formula for page in pages for formula in page[3]])
+
+    results = []
+    offset = 0
+    for path, original, soup, formulas, unmatched in pages:
+        page_rendered = rendered[offset:offset + len(formulas)]
+        offset += len(formulas)
+        # Keep client-side MathJax, and the escapes it resolves, for
+        # whatever could not be found here
+        if unmatched == 0:
+            unescape_dollars(soup)
+            drop_client_math(soup)
+        html = MARKER.sub(lambda match: page_rendered[int(match.group(1))], str(soup))
+        if html != original:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(html)
+        results.append((path, len(formulas), unmatched))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="HTML files, or directories of them, rewritten in place")
+    parser.add_argument("--renderer", help=f"renderer command (default: {' '.join(RENDERER)})")
+    parser.add_argument("--cache", default=CACHE_PATH, help="formula cache file")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the formula cache file")
+    args = parser.parse_args()
+
+    paths = []
+    for path in map(Path, args.paths):
+        paths.extend(sorted(path.glob("*.html")) if path.is_dir() else [path])
+
+    renderer = MathRenderer(args.renderer.split() if args.renderer else None,
+                            None if args.no_cache else args.cache)
+    try:
+        results = prerender_files(paths, renderer)
+    except MathRenderError as e:
+        print(f"Error: {e}")
+        return 1
+    for path, count, unmatched in results:
+        note = f", {unmatched} unmatched delimiter(s): MathJax kept" if unmatched else ""
+        print(f"{path}: {count} formula(s){note}")
+    print(renderer.stats())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+One shared, fingerprinted stylesheet for the generated pages
+
+site.css next to this script is the source. publish() copies it to
+assets/site.<digest>.css at the root of the site, so its URL changes
+whenever its content does and browsers can cache it for good; the
+generators link every page they write to that copy instead of inlining
+the rules. The .vocab rules process_vocab.py used to append to each page
+are part of it.
+
+`python site_css.py migrate` rewrites existing pages: rules of a page's
+<style> block that site.css also has are replaced by the link, and only
+the page's own rules stay inline. A page is left alone when linking would
+bring in rules for elements it has that it did not style before (use
+--force to migrate it anyway), or when its CSS is more than plain rules.
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sys
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from vendor_assets import ASSETS_DIR, ROOT, write_cache_headers
+
+SOURCE_PATH = Path(os.path.dirname(os.path.abspath(__file__))) / "site.css"
+
+# Pages whose styles used to come from the generators' templates
+MIGRATE_DIRS = [ROOT / "cf" / "html"]
+
+STYLE_BLOCK = re.compile(r"([ \t]*)<style>(.*?)</style>", re.DOTALL)
+RULE = re.compile(r"\s*([^{}]+?)\s*\{([^{}]*)\}")
+COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+PSEUDO = re.compile(r"::?[\w-]+(?:\([^)]*\))?")
+SITE_LINK = re.compile(r'<link rel="stylesheet" href="[^"]*site\.[0-9a-f]+\.css">')
+
+
+def rule_key(selector, declarations):
+    """A rule with whitespace normalized, for comparison"""
+    selector = " ".join(selector.split())
+    declarations = tuple(" ".join(f"{name.strip()}: {value.strip()}".split())
+                         for name, _, value in (d.partition(":") for d in declarations.split(";") if d.strip()))
+    return selector, declarations
+
+
+def parse_rules(css):
+    """[(key, text)] of a block of plain rules, or None if it has anything else (@media, ...)"""
+    css = COMMENT.sub("", css)
+    rules = []
+    end = 0
+    for match in RULE.finditer(css):
+        if css[end:match.start()].strip():
+            return None
+        if "@" in match.group(1):
+            return None
+        rules.append((rule_key(match.group(1), match.group(2)), match.group(0)))
+        end = match.end()
+    if css[end:].strip():
+        return None
+    return rules
+
+
+def site_rules():
+    with open(SOURCE_PATH, encoding="utf-8") as f:
+        return {key for key, _ in parse_rules(f.read())}
+
+
+def publish():
+    """Write assets/site.<digest>.css if it is not there yet and return its path"""
+    css = SOURCE_PATH.read_bytes()
+    path = ASSETS_DIR / f"site.{hashlib.sha256(css).hexdigest()[:10]}.css"
+    if not path.exists():
+        ASSETS_DIR.mkdir(exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(css)
+        os.replace(tmp, path)
+        write_cache_headers()
+    return path
+
+
+def stylesheet_link(page_path):
+    """The <link> to the published site.css for a page written to page_path"""
+    url = os.path.relpath(publish(), Path(page_path).resolve().parent).replace(os.sep, "/")
+    return f'<link rel="stylesheet" href="{url}">'
+
+
+def migrate_page(html, page_path, shared, force=False):
+    """Return html with its <style> block reduced to the page's own rules plus the link, or None"""
+    if SITE_LINK.search(html):
+        return None
+    match = STYLE_BLOCK.search(html)
+    if match is None:
+        return None
+    rules = parse_rules(match.group(2))
+    if rules is None:
+        return None
+
+    if not force:
+        # Rules the page gains must not style anything in it
+        soup = BeautifulSoup(html, "html.parser")
+        gained = shared - {key for key, _ in rules}
+        for selector, _ in gained:
+            if any(soup.select_one(PSEUDO.sub("", part).strip() or "*")
+                   for part in selector.split(",")):
+                return None
+
+    indent = match.group(1)
+    replacement = indent + stylesheet_link(page_path)
+    own = [text for key, text in rules if key not in shared]
+    if own:
+        replacement += f"\n{indent}<style>{''.join(own)}\n{indent}</style>"
+    return html[:match.start()] + replacement + html[match.end():]
+
+
+def migrate(paths, force=False):
+    """Migrate pages in place; returns [(path, migrated)]"""
+    shared = site_rules()
+    results = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        new_html = migrate_page(html, path, shared, force)
+        if new_html is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(new_html)
+        results.append((path, new_html is not None))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("publish", help="write assets/site.<digest>.css")
+    migrate_parser = subparsers.add_parser("migrate", help="link existing pages to site.css")
+    migrate_parser.add_argument("paths", nargs="*", help="HTML files or directories (default: cf/html)")
+    migrate_parser.add_argument("--force", action="store_true",
+                                help="migrate even if site.css would style elements the page did not")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        print(publish())
+        return 0
+
+    paths = []
+    for path in map(Path, args.paths or MIGRATE_DIRS):
+        paths.extend(sorted(path.glob("*.html")) if path.is_dir() else [path])
+    results = migrate(paths, args.force)
+    for path, migrated in results:
+        print(f"{'✓' if migrated else '-'} {path}")
+    print(f"Migrated {sum(migrated for _, migrated in results)} of {len(results)} page(s) to {publish().name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
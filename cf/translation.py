@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Translation memory for the bilingual converters
+
+Translations are looked up by the SHA-256 of the normalized English text,
+first in an in-memory LRU and then in a SQLite file shared by every run and
+every worker process. Only the misses go to the translation backend, in one
+call per batch, and the results are written back, so re-running a chapter
+after a small PDF fix only translates the paragraphs that changed.
+
+translate_async sends the misses in size-bounded batches, several at a
+time, retrying failed batches with exponential backoff, and returns the
+translations in input order.
+
+Backends are classes in BACKENDS with a `name` and a
+`translate_batch(texts) -> [translation]` method. "placeholder" is the local
+stub that returns the fixed placeholder text; "http" posts batches to a
+translation service, and `python translation.py serve` runs a fake one
+locally, with configurable latency and failure rate, to try it against.
+"""
+
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import time
+import unicodedata
+import urllib.request
+
+MEMORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translation_memory.db")
+
+PLACEHOLDER = "[中文翻译待添加]"
+
+DEFAULT_URL = os.environ.get("TRANSLATOR_URL", "http://127.0.0.1:8765/translate")
+
+
+class TranslationError(Exception):
+    """A backend answered, but not with a usable translation"""
+
+
+class PlaceholderBackend:
+    """
+    Placeholder for translation. In a real implementation, you would use:
+    - A translation API (Google Translate, DeepL, etc.)
+    - A pre-translated glossary
+    - Manual translation
+    """
+    name = "placeholder"
+
+    def translate_batch(self, texts):
+        return [PLACEHOLDER for _ in texts]
+
+
+class HTTPBackend:
+    """
+    POST {"source": "en", "target": "zh", "texts": [...]} as JSON to url and
+    expect {"translations": [...]} back, one per text.
+    """
+    name = "http"
+
+    def __init__(self, url=DEFAULT_URL, timeout=60):
+        self.url = url
+        self.timeout = timeout
+
+    def translate_batch(self, texts):
+        body = json.dumps({"source": "en", "target": "zh", "texts": texts}).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            translations = json.load(response).get("translations")
+        if not isinstance(translations, list) or len(translations) != len(texts):
+            raise TranslationError(f"expected {len(texts)} translations from {self.url}")
+        return translations
+
+
+BACKENDS = {
+    "placeholder": PlaceholderBackend,
+    "http": HTTPBackend,
+}
+
+
+def normalize(text):
+    """Unicode-normalize and collapse whitespace so trivial differences share an entry"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_key(text):
+    return hashlib.sha256(normalize(text).encode("utf-8")).hexdigest()
+
+
+class TranslationMemory:
+    """
+    Cache in front of a backend: LRU dict of up to `lru_size` entries, then
+    the SQLite file at `path` (None keeps everything in memory only).
+    """
+
+    def __init__(self, backend, path=MEMORY_PATH, lru_size=4096):
+        self.backend = backend
+        self.path = path
+        self.lru_size = lru_size
+        self.lru = OrderedDict()
+        self._conn = None
+        self._conn_pid = None
+        self.hits = 0
+        self.misses = 0
+        self.backend_calls = 0
+
+    def _db(self):
+        # Connections do not survive fork; each converter process opens its own
+        if self.path is None:
+            return None
+        if self._conn is None or self._conn_pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS memory (key TEXT NOT NULL, backend TEXT NOT NULL, "
+                "source TEXT NOT NULL, translation TEXT NOT NULL, PRIMARY KEY (key, backend)) WITHOUT ROWID"
+            )
+            self._conn_pid = os.getpid()
+        return self._conn
+
+    def _remember(self, key, translation):
+        self.lru[key] = translation
+        self.lru.move_to_end(key)
+        if len(self.lru) > self.lru_size:
+            self.lru.popitem(last=False)
+
+    def _lookup(self, keys):
+        """Return {key: translation} for the keys found in the LRU or the file"""
+        found = {}
+        for key in keys:
+            if key in self.lru:
+                self.lru.move_to_end(key)
+                found[key] = self.lru[key]
+
+        db = self._db()
+        lookup = list({key for key in keys if key not in found})
+        if db is not None:
+            for i in range(0, len(lookup), 500):
+                chunk = lookup[i:i + 500]
+                rows = db.execute(
+                    f"SELECT key, translation FROM memory WHERE backend = ? AND key IN ({','.join('?' * len(chunk))})",
+                    [self.backend.name] + chunk,
+                )
+                for key, translation in rows:
+                    found[key] = translation
+                    self._remember(key, translation)
+        return found
+
+    def _misses(self, keys, texts, found):
+        # Each distinct missing text goes to the backend once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = normalize(text)
+        return missing
+
+    def _store(self, missing, translations, found):
+        for key, translation in zip(missing, translations):
+            found[key] = translation
+            self._remember(key, translation)
+        db = self._db()
+        if db is not None and missing:
+            with db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO memory VALUES (?, ?, ?, ?)",
+                    [(key, self.backend.name, source, found[key]) for key, source in missing.items()],
+                )
+
+    def translate(self, texts):
+        """Translate a list of texts, calling the backend once for all misses"""
+        keys = [text_key(text) for text in texts]
+        found = self._lookup(keys)
+        missing = self._misses(keys, texts, found)
+        if missing:
+            self.backend_calls += 1
+            self._store(missing, self.backend.translate_batch(list(missing.values())), found)
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return [found[key] for key in keys]
+
+    async def translate_async(self, texts, batch_size=32, batch_chars=4000, concurrency=4,
+                              retries=3, backoff=1.0):
+        """
+        Translate a list of texts, sending the misses in batches of at most
+        batch_size texts and batch_chars characters, at most `concurrency`
+        batches in flight. A failing batch is retried up to `retries` times,
+        waiting backoff * 2**attempt seconds (with jitter) in between.
+
+        Each batch goes into the memory as soon as it is translated, and the
+        other batches run to completion before a failure is raised, so a
+        re-run only sends what is still missing.
+        """
+        keys = [text_key(text) for text in texts]
+        found = self._lookup(keys)
+        missing = self._misses(keys, texts, found)
+
+        batches = []
+        batch, size = [], 0
+        for key, source in missing.items():
+            if batch and (len(batch) >= batch_size or size + len(source) > batch_chars):
+                batches.append(batch)
+                batch, size = [], 0
+            batch.append(key)
+            size += len(source)
+        if batch:
+            batches.append(batch)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(batch):
+            async with semaphore:
+                for attempt in range(retries + 1):
+                    self.backend_calls += 1
+                    try:
+                        # Backends are blocking; run each call in a thread
+                        translations = await asyncio.to_thread(self.backend.translate_batch,
+                                                               [missing[key] for key in batch])
+                    except (OSError, TranslationError):
+                        if attempt == retries:
+                            raise
+                        await asyncio.sleep(backoff * 2 ** attempt * random.uniform(0.8, 1.2))
+                    else:
+                        self._store({key: missing[key] for key in batch}, translations, found)
+                        return
+
+        results = await asyncio.gather(*(send(batch) for batch in batches), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return [found[key] for key in keys]
+
+    def stats(self):
+        return f"{self.hits} from translation memory, {self.misses} translated in {self.backend_calls} backend call(s)"
+
+
+class FakeTranslationHandler(BaseHTTPRequestHandler):
+    """Answers HTTPBackend requests with "[译] <text>" after a delay, failing some of them"""
+    latency = 0.2
+    fail_rate = 0.0
+
+    def do_POST(self):
+        texts = json.loads(self.rfile.read(int(self.headers["Content-Length"])))["texts"]
+        time.sleep(self.latency)
+        if random.random() < self.fail_rate:
+            self.send_error(503, "simulated failure")
+            return
+        body = json.dumps({"translations": [f"[译] {text}" for text in texts]}, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} {format % args}")
+
+
+def fake_server(port=8765, latency=0.2, fail_rate=0.0):
+    """A local stand-in for a translation service; call serve_forever() on it"""
+    handler = type("Handler", (FakeTranslationHandler,), {"latency": latency, "fail_rate": fail_rate})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translation memory tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    serve = subparsers.add_parser("serve", help="run a fake translation server for the http backend")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--latency", type=float, default=0.2, help="seconds per request")
+    serve.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = fake_server(args.port, args.latency, args.fail_rate)
+        print(f"Fake translator on http://127.0.0.1:{args.port}/translate")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
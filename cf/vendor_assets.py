@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Self-hosted front-end assets for every page of the site
+
+The pages load MathJax, three.js and OrbitControls from CDNs (and the
+polyfill.io ES6 polyfill, which every browser MathJax 3 supports has no use
+for). `fetch` unpacks pinned releases of them from their npm tarballs into
+assets/ at the root of the site, one directory per package whose name ends
+in a digest of its contents:
+
+    assets/mathjax-3.2.2-1f2e3d4c5b/es5/tex-chtml.js
+    assets/three-0.128.0-9a8b7c6d5e/build/three.min.js
+
+so a new release or a patched file gets a new URL, and everything under
+assets/ can be served with a one-year immutable Cache-Control (fetch
+writes the .htaccess for it). assets/assets.json records what is there.
+
+`rewrite` points the CDN <script> tags of existing pages at these copies
+by relative URL, drops the polyfill, and picks the smallest MathJax
+component the page needs: tex-chtml for TeX only, tex-mml-chtml when it
+also has MathML, none when it has no math at all. convert_pdf_to_html.py
+and batch_convert.py apply the same rewrite to the pages they write once
+assets/assets.json exists.
+
+    python vendor_assets.py fetch                   # from registry.npmjs.org
+    python vendor_assets.py fetch --from tarballs/  # from downloaded mathjax-3.2.2.tgz etc.
+    python vendor_assets.py rewrite                 # every page of the site
+    python vendor_assets.py fetch --rewrite         # both; the build's "vendor" step
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import posixpath
+import re
+import shutil
+import sys
+import tarfile
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(os.path.dirname(os.path.abspath(__file__))).parent
+ASSETS_DIR = ROOT / "assets"
+MANIFEST_PATH = ASSETS_DIR / "assets.json"
+
+REGISTRY = "https://registry.npmjs.org"
+
+# npm package -> (version, files or directories of the package to keep)
+PACKAGES = {
+    "mathjax": ("3.2.2", ["es5/"]),
+    "three": ("0.128.0", ["build/three.min.js", "examples/js/controls/OrbitControls.js"]),
+}
+
+# CDN script -> (package, file in it); None drops the script
+CDN_SCRIPTS = [
+    (re.compile(r"https?://polyfill\.io/"), None),
+    (re.compile(r"https?://cdn\.jsdelivr\.net/npm/mathjax@3/es5/[\w-]+\.js"), ("mathjax", "es5/{component}.js")),
+    (re.compile(r"https?://cdnjs\.cloudflare\.com/ajax/libs/three\.js/r128/three\.min\.js"),
+     ("three", "build/three.min.js")),
+    (re.compile(r"https?://cdn\.jsdelivr\.net/npm/three@0\.128\.0/examples/js/controls/OrbitControls\.js"),
+     ("three", "examples/js/controls/OrbitControls.js")),
+]
+
+SCRIPT_TAG = re.compile(r'[ \t]*<script\b[^>]*?\bsrc="([^"]+)"[^>]*>\s*</script>[ \t]*\n?')
+
+# What a page's body has to contain for MathJax to have anything to do
+SCRIPT_OR_STYLE = re.compile(r"<(script|style)\b.*?</\1>", re.DOTALL | re.IGNORECASE)
+MATHML = re.compile(r"<math[\s>]", re.IGNORECASE)
+TEX = re.compile(r"\\\(|\\\[|\$|\\begin\{")
+# A page script that typesets content it builds itself
+TYPESET_CALL = re.compile(r"\bMathJax\.(typeset\w*|startup)\b")
+MATHJAX_COMPONENT = re.compile(r'mathjax[^"\s]*/es5/([\w-]+)\.js')
+
+CACHE_HEADERS = """\
+# Every file under assets/ has a digest of its content in its path and never changes
+<IfModule mod_headers.c>
+    Header set Cache-Control "public, max-age=31536000, immutable"
+</IfModule>
+"""
+
+# Directories of the site that hold no pages
+SKIP_DIRS = {"assets", "node_modules", ".git"}
+
+
+def load_manifest():
+    """assets.json as {package: {"version", "path"}}, or None before the first fetch"""
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_cache_headers():
+    """Serve everything under assets/ with a long, immutable Cache-Control"""
+    (ASSETS_DIR / ".htaccess").write_text(CACHE_HEADERS, encoding="utf-8")
+
+
+def read_tarball(package, version, source_dir=None):
+    """The npm tarball of package@version, from source_dir or the registry"""
+    name = f"{package}-{version}.tgz"
+    if source_dir is not None:
+        return (Path(source_dir) / name).read_bytes()
+    with urllib.request.urlopen(f"{REGISTRY}/{package}/-/{name}", timeout=120) as response:
+        return response.read()
+
+
+def member_path(member):
+    """
+    A tarball member's path inside the package, without the package/
+    prefix npm tarballs put everything under. Raises ValueError for paths
+    that could land outside the target directory.
+    """
+    name = member.name.split("/", 1)[1] if "/" in member.name else member.name
+    parts = name.split("/")
+    if name.startswith("/") or posixpath.isabs(member.name) or ".." in parts or "\\" in name:
+        raise ValueError(f"unsafe path in tarball: {member.name}")
+    return name
+
+
+def fetch(package, source_dir=None):
+    """Unpack the kept files of package into a content-addressed directory; returns its manifest entry"""
+    version, keep = PACKAGES[package]
+    files = {}
+    with tarfile.open(fileobj=io.BytesIO(read_tarball(package, version, source_dir)), mode="r:gz") as tar:
+        for member in tar.getmembers():
+            # Only regular files are kept, so links are never followed
+            if not member.isfile():
+                continue
+            name = member_path(member)
+            if any(name == path or (path.endswith("/") and name.startswith(path))
+                                       for path in keep):
+                files[name] = tar.extractfile(member).read()
+
+    missing = [path for path in keep if not any(name == path or name.startswith(path) for name in files)]
+    if missing:
+        raise FileNotFoundError(f"{package}-{version}.tgz has no {', '.join(missing)}")
+
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(name.encode("utf-8") + b"\0" + hashlib.sha256(files[name]).digest())
+    directory = f"{package}-{version}-{digest.hexdigest()[:10]}"
+
+    target = ASSETS_DIR / directory
+    if not target.exists():
+        tmp = ASSETS_DIR / (directory + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        for name, data in files.items():
+            path = tmp / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+        tmp.rename(target)
+    return {"version": version, "path": directory, "files": len(files)}
+
+
+def page_component(html):
+    """
+    The MathJax component a page needs: tex-mml-chtml, tex-chtml, or None.
+    A page whose scripts call MathJax.typeset or MathJax.startup builds
+    its math at run time, so it keeps the component it loads already.
+    """
+    start = html.find("<body")
+    body = SCRIPT_OR_STYLE.sub("", html[start:] if start != -1 else html)
+    if MATHML.search(body):
+        return "tex-mml-chtml"
+    if TEX.search(body):
+        return "tex-chtml"
+    if any(TYPESET_CALL.search(match.group(0)) for match in SCRIPT_OR_STYLE.finditer(html)
+           if match.group(1).lower() == "script"):
+        loaded = MATHJAX_COMPONENT.search(html)
+        return loaded.group(1) if loaded else "tex-mml-chtml"
+    return None
+
+
+def self_host(html, page_path, manifest, component="auto"):
+    """
+    Point the CDN scripts of a page written to page_path at the vendored
+    copies in manifest. component is the MathJax component to load, or
+    "auto" to choose it from the page's content.
+    """
+    if component == "auto":
+        component = page_component(html)
+    page_dir = Path(page_path).resolve().parent
+
+    def replace(match):
+        src = match.group(1)
+        for pattern, target in CDN_SCRIPTS:
+            if not pattern.match(src):
+                continue
+            if target is None or (target[0] == "mathjax" and component is None):
+                return ""
+            package, name = target
+            path = ASSETS_DIR / manifest[package]["path"] / name.format(component=component)
+            url = os.path.relpath(path, page_dir).replace(os.sep, "/")
+            return match.group(0).replace(f'src="{src}"', f'src="{url}"')
+        return match.group(0)
+
+    return SCRIPT_TAG.sub(replace, html)
+
+
+def iter_site_pages(root=ROOT):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if name not in SKIP_DIRS)
+        for name in sorted(filenames):
+            if name.endswith(".html"):
+                yield Path(dirpath) / name
+
+
+def rewrite(paths, manifest):
+    """Rewrite pages in place; returns the number changed"""
+    changed = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            html = f.read()
+        new_html = self_host(html, path, manifest)
+        if new_html != html:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(new_html)
+            changed += 1
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fetch_parser = subparsers.add_parser("fetch", help="vendor the pinned packages into assets/")
+    fetch_parser.add_argument("--from", dest="source_dir",
+                              help="directory with the npm tarballs (mathjax-3.2.2.tgz, ...) instead of the registry")
+    fetch_parser.add_argument("--rewrite", action="store_true",
+                              help="then point every page of the site at the vendored copies")
+    rewrite_parser = subparsers.add_parser("rewrite", help="point CDN scripts at the vendored copies")
+    rewrite_parser.add_argument("paths", nargs="*", help="HTML files (default: every page of the site)")
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        ASSETS_DIR.mkdir(exist_ok=True)
+        manifest = load_manifest() or {}
+        for package in PACKAGES:
+            manifest[package] = fetch(package, args.source_dir)
+            print(f"{package}: {manifest[package]['files']} file(s) in assets/{manifest[package]['path']}")
+        with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        write_cache_headers()
+        print(f"Manifest written to {MANIFEST_PATH}")
+        if not args.rewrite:
+            return 0
+
+    manifest = load_manifest()
+    if manifest is None:
+        print(f"No {MANIFEST_PATH}; run `python vendor_assets.py fetch` first")
+        return 1
+    paths = [Path(path) for path in getattr(args, "paths", [])] or list(iter_site_pages())
+    print(f"Rewrote {rewrite(paths, manifest)} of {len(paths)} page(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
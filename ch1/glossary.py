@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+词汇表存储：词表和翻译保存在SQLite文件中，按需加载
+
+glossary/ 目录下是可编辑的源文件：
+    <词表名>.txt   每行一个单词，如 cet4.txt、cet6.txt
+    *.tsv          单词<TAB>音标<TAB>翻译[<TAB>原形]
+glossary.db 由这些源文件生成，源文件变化后自动重建。每个进程第一次查询时
+以只读方式打开，并通过mmap读取，多个工作进程共享同一份页缓存。
+
+导入完整词表：
+    python glossary.py import cet6.txt --list cet6
+    python glossary.py import dict.txt --dict
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+
+GLOSSARY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'glossary')
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'glossary.db')
+DICT_PATH = os.path.join(GLOSSARY_DIR, 'vocab.tsv')
+
+SCHEMA_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+-- 词表中每个单词及其所有词形变化
+CREATE TABLE forms (list TEXT NOT NULL, form TEXT NOT NULL, lemma TEXT NOT NULL,
+                    PRIMARY KEY (list, form)) WITHOUT ROWID;
+CREATE TABLE entries (word TEXT PRIMARY KEY, lemma TEXT NOT NULL,
+                      phonetic TEXT NOT NULL, translation TEXT NOT NULL) WITHOUT ROWID;
+'''
+
+# 词形变化规则：(后缀, 去掉的字符数, 补回的字符)
+# 单词以后缀结尾，去掉若干字符并补回后在词表中，即视为词表中的词汇
+SUFFIX_RULES = [
+    ('s', 1, ''), ('ed', 2, ''), ('ed', 1, ''), ('ing', 3, ''), ('ing', 3, 'e'),
+    ('ly', 2, ''), ('er', 2, ''), ('est', 3, ''), ('tion', 4, 'te'), ('ment', 4, ''),
+    ('ness', 4, ''), ('ful', 3, ''), ('less', 4, ''), ('able', 4, ''), ('ible', 4, ''),
+    ('ive', 3, 'e'), ('ity', 3, ''), ("'s", 2, ''),
+]
+
+# 导入时识别音标：/.../ 或 [...]
+PHONETIC_PATTERN = re.compile(r'^(/[^/]*/|\[[^\]]*\])\s*')
+
+def expand_forms(word, rules=SUFFIX_RULES):
+    """单词本身及规则能还原到它的所有词形"""
+    yield word
+    for suffix, strip, add in rules:
+        if not word.endswith(add):
+            continue
+        form = word[:len(word) - len(add)] + suffix[-strip:]
+        if form.endswith(suffix):
+            yield form
+
+def iter_source_lines(path):
+    """跳过空行和#注释"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if line.strip() and not line.lstrip().startswith('#'):
+                yield line
+
+def source_files():
+    return sorted(os.path.join(GLOSSARY_DIR, name) for name in os.listdir(GLOSSARY_DIR)
+                  if name.endswith(('.txt', '.tsv')))
+
+def source_digest():
+    """源文件内容的摘要，用于判断glossary.db是否过期"""
+    digest = hashlib.sha256(f'{SCHEMA_VERSION} {SUFFIX_RULES!r}'.encode())
+    for path in source_files():
+        digest.update(os.path.basename(path).encode() + b'\0')
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+def stored_digest(db_path=DB_PATH):
+    try:
+        conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'digest'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+def build(db_path=DB_PATH):
+    """从glossary/下的源文件重建数据库（先写临时文件再替换）"""
+    fd, tmp_path = tempfile.mkstemp(suffix='.db', dir=os.path.dirname(db_path))
+    os.close(fd)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        for path in source_files():
+            name, ext = os.path.splitext(os.path.basename(path))
+            if ext == '.txt':
+                rows = ((name, form, word)
+                        for word in (line.strip() for line in iter_source_lines(path))
+                        for form in expand_forms(word))
+                # 同一词形对应多个原形时保留第一个
+                conn.executemany('INSERT OR IGNORE INTO forms VALUES (?, ?, ?)', rows)
+            else:
+                rows = []
+                for line in iter_source_lines(path):
+                    fields = line.split('\t')
+                    word = fields[0].strip().lower()
+                    lemma = fields[3].strip().lower() if len(fields) > 3 and fields[3].strip() else word
+                    rows.append((word, lemma, fields[1].strip(), fields[2].strip()))
+                conn.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)', rows)
+        conn.execute("INSERT INTO meta VALUES ('digest', ?)", (source_digest(),))
+        conn.commit()
+        conn.execute('VACUUM')
+    finally:
+        conn.close()
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, db_path)
+
+def ensure(db_path=DB_PATH):
+    """数据库不存在或源文件有变化时重建"""
+    if stored_digest(db_path) != source_digest():
+        build(db_path)
+
+class Glossary:
+    """只读的词汇表查询，每个进程各自打开一个连接"""
+
+    def __init__(self, db_path=DB_PATH):
+        ensure(db_path)
+        self.conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True, check_same_thread=False)
+        self.conn.execute('PRAGMA mmap_size = 67108864')
+        self.cache = {}
+
+    def in_list(self, word, list_name='cet4'):
+        """word（小写）是否为词表中的单词或其词形变化"""
+        key = (list_name, word)
+        if key not in self.cache:
+            row = self.conn.execute('SELECT 1 FROM forms WHERE list = ? AND form = ?',
+                                    (list_name, word)).fetchone()
+            self.cache[key] = row is not None
+        return self.cache[key]
+
+    def classify(self, words, list_name='cet4'):
+        """批量查询，一条语句查完所有未缓存的单词"""
+        missing = list({word for word in words if (list_name, word) not in self.cache})
+        for i in range(0, len(missing), 500):
+            chunk = missing[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            found = {form for form, in self.conn.execute(
+                f'SELECT form FROM forms WHERE list = ? AND form IN ({placeholders})',
+                [list_name] + chunk)}
+            for word in chunk:
+                self.cache[(list_name, word)] = word in found
+        return [self.cache[(list_name, word)] for word in words]
+
+    def lookup(self, word):
+        """返回 (音标, 翻译, 原形)，没有收录时返回None"""
+        return self.conn.execute('SELECT phonetic, translation, lemma FROM entries WHERE word = ?',
+                                 (word,)).fetchone()
+
+_glossary = None
+_glossary_pid = None
+
+def get_glossary():
+    """当前进程的Glossary，第一次调用时打开（fork后的子进程重新打开）"""
+    global _glossary, _glossary_pid
+    if _glossary is None or _glossary_pid != os.getpid():
+        _glossary = Glossary()
+        _glossary_pid = os.getpid()
+    return _glossary
+
+def parse_import_line(line):
+    """解析导入文件的一行，返回 (单词, 音标, 翻译)
+
+    支持 单词<TAB>音标<TAB>翻译，以及常见词表格式 abandon [əˈbændən] v.放弃
+    """
+    if '\t' in line:
+        fields = [field.strip() for field in line.split('\t')] + ['', '']
+        return fields[0].lower(), fields[1], fields[2]
+    parts = line.strip().split(None, 1)
+    word = parts[0].lower()
+    rest = parts[1] if len(parts) > 1 else ''
+    match = PHONETIC_PATTERN.match(rest)
+    phonetic = ''
+    if match:
+        phonetic = '/' + match.group(1)[1:-1] + '/'
+        rest = rest[match.end():]
+    return word, phonetic, rest.strip()
+
+def import_words(path, list_name):
+    """把外部词表中的单词合并到 glossary/<list_name>.txt，返回新增的单词数"""
+    target = os.path.join(GLOSSARY_DIR, f'{list_name}.txt')
+    existing = set()
+    if os.path.exists(target):
+        existing = {line.strip().lower() for line in iter_source_lines(target)}
+    added = []
+    for line in iter_source_lines(path):
+        word = parse_import_line(line)[0]
+        if re.fullmatch(r"[a-z][a-z'\-]*", word) and word not in existing:
+            existing.add(word)
+            added.append(word)
+    if added:
+        with open(target, 'a', encoding='utf-8') as f:
+            f.write(f'# 导入自 {os.path.basename(path)}\n')
+            f.write(''.join(word + '\n' for word in added))
+    return len(added)
+
+def import_dict(path, replace=False):
+    """把外部词典中的音标和翻译合并到 glossary/vocab.tsv，返回新增或替换的条目数"""
+    existing = {}
+    for line in iter_source_lines(DICT_PATH):
+        existing[line.split('\t')[0].strip().lower()] = line
+    changed = {}
+    for line in iter_source_lines(path):
+        word, phonetic, translation = parse_import_line(line)
+        if not translation or (word in existing and not replace):
+            continue
+        changed[word] = f'{word}\t{phonetic}\t{translation}'
+    if changed:
+        with open(DICT_PATH, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        kept = [line for line in lines
+                if line.lstrip().startswith('#') or line.split('\t')[0].strip().lower() not in changed]
+        kept.append(f'# 导入自 {os.path.basename(path)}')
+        kept.extend(changed.values())
+        with open(DICT_PATH, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(kept) + '\n')
+    return len(changed)
+
+def main():
+    parser = argparse.ArgumentParser(description='管理词汇表数据库')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('build', help='从glossary/下的源文件重建glossary.db')
+    import_parser = subparsers.add_parser('import', help='导入词表或词典')
+    import_parser.add_argument('file')
+    group = import_parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--list', help='导入为词表（如cet4、cet6）')
+    group.add_argument('--dict', action='store_true', help='导入音标和翻译')
+    import_parser.add_argument('--replace', action='store_true', help='覆盖已有的翻译（与--dict一起使用）')
+    lookup_parser = subparsers.add_parser('lookup', help='查询单词')
+    lookup_parser.add_argument('words', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        if args.list:
+            print(f"{args.list}: 新增 {import_words(args.file, args.list)} 个单词")
+        else:
+            print(f"词典: 新增或替换 {import_dict(args.file, args.replace)} 个条目")
+    if args.command in ('build', 'import'):
+        build()
+        conn = sqlite3.connect(DB_PATH)
+        forms, entries = (conn.execute(f'SELECT count(*) FROM {table}').fetchone()[0]
+                          for table in ('forms', 'entries'))
+        conn.close()
+        print(f"已生成 {DB_PATH}: {forms} 个词形，{entries} 个词条")
+    if args.command == 'lookup':
+        glossary = get_glossary()
+        lists = [name for name, in glossary.conn.execute('SELECT DISTINCT list FROM forms')]
+        for word in args.words:
+            word = word.lower()
+            found = [name for name in lists if glossary.in_list(word, name)]
+            print(word, ','.join(found) or '-', glossary.lookup(word) or '')
+
+if __name__ == '__main__':
+    main()
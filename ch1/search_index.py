@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+全站全文检索索引：供search/目录下的静态检索页按需加载
+
+英文用process_vocab.py标注词汇时的分词规则（WORD_PATTERN，转小写），
+中文按连续汉字切成二元组（单个汉字自成一词）。索引写入search/index/：
+
+    meta.json            页面列表 [路径, 标题, 书名, 词数] 与分片文件名
+    <分片号>.<摘要>.json  {词: 倒排表}，倒排表为 [页面号差值, 词频, ...]
+
+词按FNV-1a散列分到若干分片，检索时只下载查询词所在的分片。分片文件名
+含内容摘要，可以长期缓存；每次构建只有meta.json的内容会变。
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+from bs4 import BeautifulSoup
+
+from process_vocab import ROOT, WORD_PATTERN, natural_key
+
+# 每本书的HTML页面（比标注范围多出各章的分节页面和riemannroch的演示页）
+BOOKS = {
+    'pairings': ['ch*/*.html', 'ch*/sections/*.html'],
+    'cf': ['cf/html/*.html'],
+    'ag': ['ag/html/*.html'],
+    'ff': ['ff/*.html'],
+    'riemannroch': ['riemannroch/*.html', 'riemannroch/top/*.html'],
+}
+
+INDEX_DIR = os.path.join(ROOT, 'search', 'index')
+
+INDEX_VERSION = 1
+
+# 每个分片的目标大小（字节），分片数取满足它的最小的2的幂
+SHARD_SIZE = 32 * 1024
+
+CJK_RUN = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+# LaTeX命令（\mathbb、\frac等）不是正文中的词
+TEX_COMMAND = re.compile(r'\\[A-Za-z]+')
+# 正文之外的元素
+SKIP_TAGS = ['script', 'style', 'noscript', 'svg', 'math', 'head']
+
+def tokenize(text):
+    """按出现顺序产出文本中的词：英文单词（小写，至少两个字母）和汉字二元组"""
+    text = TEX_COMMAND.sub(' ', text)
+    last_end = 0
+    for run in CJK_RUN.finditer(text):
+        # 汉字紧挨英文时\b不成立，因此英文部分要与汉字分开匹配
+        yield from iter_words(text[last_end:run.start()])
+        chars = run.group()
+        if len(chars) == 1:
+            yield chars
+        for i in range(len(chars) - 1):
+            yield chars[i:i + 2]
+        last_end = run.end()
+    yield from iter_words(text[last_end:])
+
+def iter_words(text):
+    for match in WORD_PATTERN.finditer(text):
+        word = match.group(1)
+        if len(word) >= 2:
+            yield word.lower()
+
+def shard_of(term, shards):
+    """词所在的分片：UTF-8字节的32位FNV-1a散列对分片数取模（search.js中的算法与此相同）"""
+    h = 0x811c9dc5
+    for byte in term.encode('utf-8'):
+        h = ((h ^ byte) * 0x01000193) & 0xffffffff
+    return h % shards
+
+def find_pages(books=BOOKS):
+    """返回 [(书名, 相对路径)]，按书和页面顺序排列"""
+    pages = []
+    for book, patterns in books.items():
+        paths = set()
+        for pattern in patterns:
+            paths.update(os.path.relpath(path, ROOT) for path in glob.glob(os.path.join(ROOT, pattern)))
+        pages.extend((book, path) for path in sorted(paths, key=natural_key))
+    return pages
+
+def read_page(path):
+    """返回 (标题, {词: 词频}, 词数)"""
+    with open(os.path.join(ROOT, path), 'r', encoding='utf-8') as f:
+        soup = BeautifulSoup(f.read(), 'html.parser')
+    title_tag = soup.find('title') or soup.find('h1')
+    title = ' '.join(title_tag.get_text().split()) if title_tag else os.path.basename(path)
+    for tag in soup.find_all(SKIP_TAGS):
+        tag.decompose()
+
+    counts = {}
+    length = 0
+    for term in tokenize(soup.get_text(' ')):
+        counts[term] = counts.get(term, 0) + 1
+        length += 1
+    return title, counts, length
+
+def encode_postings(postings):
+    """[(页面号, 词频)]（页面号递增）-> [页面号差值, 词频, ...]"""
+    encoded = []
+    previous = 0
+    for doc, tf in postings:
+        encoded.extend((doc - previous, tf))
+        previous = doc
+    return encoded
+
+def dump(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+
+def build_index(pages, scans):
+    """返回 (meta, {分片文件名: 内容})"""
+    docs = []
+    postings = {}
+    for doc, ((book, path), (title, counts, length)) in enumerate(zip(pages, scans)):
+        docs.append([path.replace(os.sep, '/'), title, book, length])
+        for term, tf in counts.items():
+            postings.setdefault(term, []).append((doc, tf))
+
+    encoded = {term: encode_postings(entries) for term, entries in postings.items()}
+    total = sum(len(term) + len(dump(entries)) + 4 for term, entries in encoded.items())
+    shards = 1
+    while total / shards > SHARD_SIZE:
+        shards *= 2
+
+    buckets = [{} for _ in range(shards)]
+    for term, entries in encoded.items():
+        buckets[shard_of(term, shards)][term] = entries
+    files = {}
+    for i, bucket in enumerate(buckets):
+        content = dump(bucket)
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:10]
+        files[f'{i:03d}.{digest}.json'] = content
+
+    meta = {
+        'version': INDEX_VERSION,
+        'docs': docs,
+        'terms': len(encoded),
+        'shards': list(files),
+    }
+    return meta, files
+
+def write_index(meta, files, index_dir=INDEX_DIR):
+    """写入新分片，再写meta.json，最后删除旧分片"""
+    os.makedirs(index_dir, exist_ok=True)
+    for name, content in files.items():
+        path = os.path.join(index_dir, name)
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(content)
+    tmp = os.path.join(index_dir, 'meta.json.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(dump(meta))
+    os.replace(tmp, os.path.join(index_dir, 'meta.json'))
+    for name in os.listdir(index_dir):
+        if name.endswith('.json') and name != 'meta.json' and name not in files:
+            os.remove(os.path.join(index_dir, name))
+
+def main():
+    parser = argparse.ArgumentParser(description='生成全站全文检索索引（search/index/）')
+    parser.add_argument('--jobs', '-j', type=int, default=0,
+                        help='并行进程数（默认：每个CPU一个）')
+    args = parser.parse_args()
+
+    pages = find_pages()
+    with ProcessPoolExecutor(max_workers=args.jobs or os.cpu_count()) as pool:
+        scans = list(pool.map(read_page, [path for _, path in pages], chunksize=8))
+    meta, files = build_index(pages, scans)
+    write_index(meta, files)
+    size = sum(len(content.encode('utf-8')) for content in files.values())
+    print(f"索引 {len(pages)} 个页面，{meta['terms']} 个词，"
+          f"{len(files)} 个分片共 {size / 1024:.0f} KB，写入 {os.path.relpath(INDEX_DIR, ROOT)}/")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+// Full-text search over the site, against the index ch1/search_index.py writes
+// to search/index/. meta.json (the page list) is fetched on the first query;
+// a term's postings live in one shard, fetched the first time a query needs it.
+// Tokenization and shard hashing mirror search_index.py and must stay in step.
+
+(function (global) {
+    'use strict';
+
+    var INDEX_VERSION = 1;
+    // Python's \b (WORD_PATTERN) is Unicode-aware: "café" has no word "caf"
+    var WORD = /(?<![\p{L}\p{N}_])([A-Za-z]+(?:-[A-Za-z]+)*)(?![\p{L}\p{N}_])/gu;
+    var CJK_RUN = /[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+/g;
+    var TEX_COMMAND = /\\[A-Za-z]+/g;
+    // BM25 parameters
+    var K1 = 1.2;
+    var B = 0.75;
+
+    function words(text, terms) {
+        var match;
+        WORD.lastIndex = 0;
+        while ((match = WORD.exec(text)) !== null) {
+            if (match[1].length >= 2) terms.push(match[1].toLowerCase());
+        }
+    }
+
+    function tokenize(text) {
+        var terms = [];
+        var lastEnd = 0;
+        var run;
+        text = text.replace(TEX_COMMAND, ' ');
+        CJK_RUN.lastIndex = 0;
+        while ((run = CJK_RUN.exec(text)) !== null) {
+            words(text.slice(lastEnd, run.index), terms);
+            var chars = run[0];
+            if (chars.length === 1) terms.push(chars);
+            for (var i = 0; i + 1 < chars.length; i++) terms.push(chars.slice(i, i + 2));
+            lastEnd = run.index + chars.length;
+        }
+        words(text.slice(lastEnd), terms);
+        return terms;
+    }
+
+    // 32-bit FNV-1a of the term's UTF-8 bytes
+    function shardOf(term, shards) {
+        var bytes = new TextEncoder().encode(term);
+        var h = 0x811c9dc5;
+        for (var i = 0; i < bytes.length; i++) {
+            h = Math.imul(h ^ bytes[i], 0x01000193) >>> 0;
+        }
+        return h % shards;
+    }
+
+    function fetchJSON(url) {
+        return fetch(url).then(function (response) {
+            if (!response.ok) throw new Error(url + ': ' + response.status);
+            return response.json();
+        });
+    }
+
+    // baseUrl is the directory holding meta.json; page paths are relative to siteUrl
+    function SiteSearch(baseUrl, siteUrl) {
+        this.baseUrl = baseUrl.replace(/\/?$/, '/');
+        this.siteUrl = siteUrl === undefined ? this.baseUrl + '../../' : siteUrl.replace(/\/?$/, '/');
+        this.meta = null;
+        this.shards = {};
+    }
+
+    SiteSearch.prototype.loadMeta = function () {
+        var self = this;
+        if (!this.meta) {
+            this.meta = fetchJSON(this.baseUrl + 'meta.json').then(function (meta) {
+                if (meta.version !== INDEX_VERSION) throw new Error('unsupported search index version ' + meta.version);
+                var total = 0;
+                meta.docs.forEach(function (doc) { total += doc[3]; });
+                meta.averageLength = total / Math.max(1, meta.docs.length);
+                return meta;
+            });
+            this.meta.catch(function () { self.meta = null; });
+        }
+        return this.meta;
+    };
+
+    SiteSearch.prototype.loadShard = function (meta, i) {
+        var self = this;
+        if (!this.shards[i]) {
+            this.shards[i] = fetchJSON(this.baseUrl + meta.shards[i]);
+            this.shards[i].catch(function () { delete self.shards[i]; });
+        }
+        return this.shards[i];
+    };
+
+    // {doc: tf} of a term, decoding its delta-encoded postings
+    SiteSearch.prototype.postings = function (meta, term) {
+        return this.loadShard(meta, shardOf(term, meta.shards.length)).then(function (shard) {
+            var encoded = shard[term] || [];
+            var result = {};
+            var doc = 0;
+            for (var i = 0; i < encoded.length; i += 2) {
+                doc += encoded[i];
+                result[doc] = encoded[i + 1];
+            }
+            return result;
+        });
+    };
+
+    // Pages containing every term of the query, best first:
+    // [{url, title, book, score}]
+    SiteSearch.prototype.search = function (query, limit) {
+        var self = this;
+        var terms = tokenize(query).filter(function (term, i, all) { return all.indexOf(term) === i; });
+        if (!terms.length) return Promise.resolve([]);
+        return this.loadMeta().then(function (meta) {
+            return Promise.all(terms.map(function (term) { return self.postings(meta, term); }))
+                .then(function (lists) {
+                    var n = meta.docs.length;
+                    var dfs = lists.map(function (list) { return Object.keys(list).length; });
+                    var order = terms.map(function (_, i) { return i; })
+                        .sort(function (a, b) { return dfs[a] - dfs[b]; });
+                    var results = [];
+                    // Walk the rarest term's pages; each must have all the others
+                    Object.keys(lists[order[0]]).forEach(function (doc) {
+                        var score = 0;
+                        for (var k = 0; k < order.length; k++) {
+                            var i = order[k];
+                            var tf = lists[i][doc];
+                            if (tf === undefined) return;
+                            var idf = Math.log(1 + (n - dfs[i] + 0.5) / (dfs[i] + 0.5));
+                            var norm = 1 - B + B * meta.docs[doc][3] / meta.averageLength;
+                            score += idf * tf * (K1 + 1) / (tf + K1 * norm);
+                        }
+                        var page = meta.docs[doc];
+                        results.push({url: self.siteUrl + page[0], title: page[1], book: page[2], score: score});
+                    });
+                    results.sort(function (a, b) { return b.score - a.score; });
+                    return results.slice(0, limit || 20);
+                });
+        });
+    };
+
+    SiteSearch.tokenize = tokenize;
+    global.SiteSearch = SiteSearch;
+})(this);